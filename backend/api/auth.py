@@ -1,10 +1,9 @@
 # --- IMPORTS & ROUTER KHAI BÁO ĐẦU FILE ---
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from database.models.auth_models import User
 from middleware.dependencies import get_db, get_current_user
-from security import verify_token
 from services.auth import AuthService
 from config.settings import settings
 from schemas.auth import (
@@ -13,14 +12,17 @@ from schemas.auth import (
     LoginRequest, ResetPasswordRequest, ResetPasswordConfirm
 )
 from services.user import UserService, UserCreate
+from services.rate_limit import auth_rate_limiter
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 # Endpoint: Register (chuẩn fullstackhero)
 @router.post("/register", response_model=TokenResponse)
 def register(
+    request: Request,
     user_data: LoginRequest,
     db: Session = Depends(get_db)
 ):
+    auth_rate_limiter.check(request, user_data.email)
     service = UserService(db)
     # Check if user exists
     if db.query(User).filter((User.email == user_data.email) | (User.username == user_data.email)).first():
@@ -69,46 +71,52 @@ def get_me(current_user: User = Depends(get_current_user)):
     if not isinstance(username, str):
         username = str(username) if username is not None else ""
     return Login(username=username, password="protected")
-
-# Endpoint: Logout (chuẩn fullstackhero, chỉ là dummy)
-@router.post("/logout", response_model=MessageResponse)
-def logout():
-    return MessageResponse(message="Logged out (client hãy xóa token)")
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from database.models.auth_models import User
-from middleware.dependencies import get_db, get_current_user
-from security import verify_token
+from middleware.dependencies import get_db, get_current_user, limit_authenticated_attempts
 from services.auth import AuthService
 from config.settings import settings
 from schemas.auth import (
     RefreshTokenRequest, TokenResponse, Login, 
     ChangePasswordRequest, SimpleResetPasswordRequest, MessageResponse
 )
+from fastapi.concurrency import run_in_threadpool
+from services.password_hashing import password_hasher
+from services.token_revocation import revocation_index
+from middleware.permissions import require_admin
+from services.rate_limit import auth_rate_limiter
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 # Endpoint: Simple login with JSON body
 @router.post("/login", response_model=TokenResponse)
-def login(
+async def login(
+    request: Request,
     login_data: Login,
     db: Session = Depends(get_db)
 ):
     """
     Đăng nhập đơn giản với username và password
     """
+    # Chặn dò mật khẩu trước khi query user hay chạy bcrypt
+    await auth_rate_limiter.check_async(request, login_data.username)
     auth_service = AuthService(db)
     try:
-        user = auth_service.authenticate_user(login_data.username, login_data.password)
+        user = await auth_service.authenticate_user_async(login_data.username, login_data.password)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
 
-    access_token = auth_service.create_access_token(
+    # Snapshot quyền trong access token có thể hỏi DB -> chạy trong threadpool
+    access_token = await run_in_threadpool(
+        auth_service.create_access_token,
         user,
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    refresh_token = auth_service.create_refresh_token(
+    # Ghi family mới vào refresh_families -> chạy trong threadpool
+    refresh_token = await run_in_threadpool(
+        auth_service.create_refresh_token,
         user,
         expires_delta=timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
     )
@@ -125,21 +133,12 @@ def refresh_access_token(
         refresh_data: RefreshTokenRequest,
         db: Session = Depends(get_db)
 ):
-    # Verify the refresh token
-    payload = verify_token(refresh_data.refresh_token, is_refresh=True)
-    user_id = payload.get("sub")
-    if user_id is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-
-    # Query the user from the database
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-
     auth_service = AuthService(db)
-    # Create new tokens for the user
-    new_access_token = auth_service.create_access_token(user)
-    new_refresh_token = auth_service.create_refresh_token(user)
+    # Xoay vòng: refresh token cũ bị thu hồi, trả về cặp token mới cùng family
+    try:
+        new_access_token, new_refresh_token = auth_service.rotate_refresh_token(refresh_data.refresh_token)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
 
     return TokenResponse(
         access_token=new_access_token,
@@ -147,9 +146,22 @@ def refresh_access_token(
         token_type="bearer"
     )
 
+# Endpoint: Logout (thu hồi cả family của refresh token; access token hết hạn theo exp)
+@router.post("/logout", response_model=MessageResponse)
+def logout(
+    refresh_data: RefreshTokenRequest,
+    db: Session = Depends(get_db)
+):
+    auth_service = AuthService(db)
+    try:
+        auth_service.revoke_refresh_token_family(refresh_data.refresh_token)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+    return MessageResponse(message="Logged out")
+
 # Endpoint: Change password
-@router.put("/change-password", response_model=MessageResponse)
-def change_password(
+@router.put("/change-password", response_model=MessageResponse, dependencies=[Depends(limit_authenticated_attempts)])
+async def change_password(
     change_data: ChangePasswordRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -159,7 +171,7 @@ def change_password(
     """
     auth_service = AuthService(db)
     try:
-        auth_service.change_password(
+        await auth_service.change_password_async(
             current_user, 
             change_data.current_password, 
             change_data.new_password
@@ -171,16 +183,30 @@ def change_password(
 
 # Endpoint: Simple reset password 
 @router.post("/reset-password", response_model=MessageResponse)
-def reset_password(
+async def reset_password(
+    request: Request,
     reset_data: SimpleResetPasswordRequest,
     db: Session = Depends(get_db)
 ):
     """
     Reset password đơn giản với username và new_password
     """
+    await auth_rate_limiter.check_async(request, reset_data.username)
     auth_service = AuthService(db)
     try:
-        auth_service.simple_reset_password(reset_data.username, reset_data.new_password)
+        await auth_service.simple_reset_password_async(reset_data.username, reset_data.new_password)
         return MessageResponse(message=f"Password has been reset successfully for user: {reset_data.username}")
     except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+# Endpoint: Thống kê process pool hash mật khẩu (độ sâu hàng đợi, độ trễ, số lần từ chối)
+@router.get("/hashing-stats", dependencies=[Depends(require_admin)])
+def get_hashing_stats():
+    return password_hasher.stats()
+
+
+# Endpoint: Thống kê chỉ mục thu hồi refresh token (số entry, kích thước Bloom, tỉ lệ bị loại ở Bloom)
+@router.get("/revocation-stats", dependencies=[Depends(require_admin)])
+def get_revocation_stats():
+    return revocation_index.stats()
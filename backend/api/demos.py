@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from middleware.dependencies import get_db, get_current_user
-from services.rbac import RBACService
+from middleware.permissions import has_permission
+from middleware.http_cache import cache_headers, make_etag, not_modified
 from services.demo import DemoService
+from services.pagination import count_mode, decode_cursor, next_page
+from services.export import DEMO_EXPORT_COLUMNS, EXPORT_MEDIA_TYPES, demo_export_chunks, stream_export
 from schemas.demos import DemoCreate, DemoUpdate, DemoResponse, PaginatedDemoResponse
 
 router = APIRouter(prefix="/demos", tags=["Demos"])
@@ -12,42 +16,70 @@ router = APIRouter(prefix="/demos", tags=["Demos"])
 
 @router.get("/", response_model=PaginatedDemoResponse)
 def get_demos(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     search: str = Query("", alias="search"),
+    sort: str = Query("id", description="id | created_at | title, prefix '-' for descending"),
+    after: Optional[str] = Query(None, description="Cursor from next_cursor; replaces page"),
+    include_total: bool = Query(True, description="Skip the count when false"),
+    approximate_total: bool = Query(False, description="Estimate the total from table statistics when not searching"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """Lấy danh sách tất cả demos (có tìm kiếm)"""
-    role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("demo", [])
-    if "demo.view" not in actions:
+    """Lấy danh sách tất cả demos (có tìm kiếm; phân trang theo page hoặc cursor)"""
+    if not has_permission(request, db, current_user.id, "demo", "demo.view"):
         raise HTTPException(status_code=403, detail="You don't have permission to view demos")
     demo_service = DemoService(db)
     skip = (page - 1) * page_size
-    demos = demo_service.get_all_demos(skip=skip, limit=page_size, search=search or None)
-    total = demo_service.count_demos(search=search or None)
+    try:
+        cursor = decode_cursor(after, sort) if after else None
+        # Trang và tổng số trong 1 câu SQL (window count), hoặc tổng từ cache / ước lượng;
+        # lấy dư 1 dòng để biết còn trang sau hay không
+        demos, total = demo_service.get_demos_with_total(
+            skip=skip, limit=page_size + 1, search=search or None, sort=sort, after=cursor,
+            count=count_mode(include_total, approximate_total),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    demos, next_cursor = next_page(demos, page_size, sort, sort.lstrip("-"))
     return {
         "data": demos,
         "total": total,
-        "page": page,
-        "page_size": page_size
+        "page": None if after else page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
     }
 
 
 
+@router.get("/export")
+def export_demos(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    search: str = Query("", alias="search"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Export toàn bộ demos (NDJSON/CSV) theo luồng, bộ nhớ không phụ thuộc kích thước bảng"""
+    if not has_permission(request, db, current_user.id, "demo", "demo.view"):
+        raise HTTPException(status_code=403, detail="You don't have permission to view demos")
+    return StreamingResponse(
+        stream_export(demo_export_chunks, format, DEMO_EXPORT_COLUMNS, search=search),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="demos.{format}"'},
+    )
+
+
 @router.post("/", response_model=DemoResponse, status_code=status.HTTP_201_CREATED)
 def create_demo(
+    request: Request,
     demo_data: DemoCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Tạo demo mới"""
-    role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("demo", [])
-    if "demo.create" not in actions:
+    if not has_permission(request, db, current_user.id, "demo", "demo.create"):
         raise HTTPException(status_code=403, detail="You don't have permission to create demos")
     demo_service = DemoService(db)
     new_demo = demo_service.create_demo(demo_data)
@@ -56,16 +88,14 @@ def create_demo(
 
 @router.put("/{demo_id}", response_model=DemoResponse)
 def update_demo(
+    request: Request,
     demo_id: int,
     demo_data: DemoUpdate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Cập nhật demo"""
-    role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("demo", [])
-    if "demo.update" not in actions:
+    if not has_permission(request, db, current_user.id, "demo", "demo.update"):
         raise HTTPException(status_code=403, detail="You don't have permission to update demos")
     demo_service = DemoService(db)
     demo = demo_service.get_demo_by_id(demo_id)
@@ -80,15 +110,13 @@ def update_demo(
 
 @router.delete("/{demo_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_demo(
+    request: Request,
     demo_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Xóa demo"""
-    role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("demo", [])
-    if "demo.delete" not in actions:
+    if not has_permission(request, db, current_user.id, "demo", "demo.delete"):
         raise HTTPException(status_code=403, detail="You don't have permission to delete demos")
     demo_service = DemoService(db)
     demo = demo_service.get_demo_by_id(demo_id)
@@ -107,15 +135,14 @@ def delete_demo(
 
 @router.get("/{demo_id}", response_model=DemoResponse)
 def get_demo(
+    request: Request,
+    response: Response,
     demo_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Lấy chi tiết demo"""
-    role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("demo", [])
-    if "demo.view" not in actions:
+    if not has_permission(request, db, current_user.id, "demo", "demo.view"):
         raise HTTPException(status_code=403, detail="You don't have permission to view demo details")
     demo_service = DemoService(db)
     demo = demo_service.get_demo_by_id(demo_id)
@@ -124,4 +151,11 @@ def get_demo(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Demo not found"
         )
+    # ETag theo version (đổi ở mọi lần sửa); updated_at là None cho tới lần sửa đầu tiên
+    last_modified = demo.updated_at or demo.created_at
+    etag = make_etag("demo", demo.id, demo.version)
+    cached = not_modified(request, etag, last_modified)
+    if cached is not None:
+        return cached
+    response.headers.update(cache_headers(etag, last_modified))
     return demo
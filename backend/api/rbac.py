@@ -1,16 +1,36 @@
 
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from schemas.rbac import RoleCreate, ModuleCreate, PermissionCreate, AssignRoleToUser, AssignPermissionToRole, RemovePermissionFromRole, RoleOut
+from schemas.rbac import RoleCreate, ModuleCreate, PermissionCreate, AssignRoleToUser, AssignPermissionToRole, RemovePermissionFromRole, RoleOut, RBACBatchRequest, RBACBatchResponse, CheckPermissionsRequest, CheckPermissionsResponse
 from services.rbac import RBACService
+from services.audit import audit_buffer
 from middleware.dependencies import get_db
+from middleware.permissions import require_admin
+from middleware.http_cache import cache_headers, make_etag, not_modified
+from services.permission_cache import permission_cache
 
 router = APIRouter(prefix="/rbac", tags=["RBAC"])
 
 
+def _catalog_not_modified(request: Request, response: Response, name: str):
+    """
+    Conditional GET cho danh mục RBAC: ETag theo version RBAC dùng chung (đổi ở mọi thay đổi role/module/permission,
+    giống nhau ở mọi worker).
+    Trả về 304 nếu client đã có bản hiện tại, ngược lại gắn header cache vào response và trả về None.
+    """
+    etag = make_etag("rbac", name, permission_cache.stamp())
+    cached = not_modified(request, etag)
+    if cached is None:
+        response.headers.update(cache_headers(etag))
+    return cached
+
+
 @router.get("/roles", response_model=list[RoleOut])
-def get_roles(db: Session = Depends(get_db)):
+def get_roles(request: Request, response: Response, db: Session = Depends(get_db)):
+    cached = _catalog_not_modified(request, response, "roles")
+    if cached is not None:
+        return cached
     service = RBACService(db)
     return service.get_all_roles()
 
@@ -21,7 +41,10 @@ def create_role(data: RoleCreate, db: Session = Depends(get_db)):
     return service.create_role(data.name, desc)
 
 @router.get("/modules")
-def get_modules(db: Session = Depends(get_db)):
+def get_modules(request: Request, response: Response, db: Session = Depends(get_db)):
+    cached = _catalog_not_modified(request, response, "modules")
+    if cached is not None:
+        return cached
     service = RBACService(db)
     return service.get_all_modules()
 
@@ -32,7 +55,10 @@ def create_module(data: ModuleCreate, db: Session = Depends(get_db)):
     return service.create_module(data.name, desc)
 
 @router.get("/permissions")
-def get_permissions(db: Session = Depends(get_db)):
+def get_permissions(request: Request, response: Response, db: Session = Depends(get_db)):
+    cached = _catalog_not_modified(request, response, "permissions")
+    if cached is not None:
+        return cached
     service = RBACService(db)
     return service.get_all_permissions()
 
@@ -60,12 +86,33 @@ def assign_permission_to_role(data: AssignPermissionToRole, db: Session = Depend
     service = RBACService(db)
     return service.assign_permission_to_role(data.role_id, data.module_id, data.permission_id)
 
+@router.post("/batch", response_model=RBACBatchResponse)
+def apply_rbac_batch(data: RBACBatchRequest, db: Session = Depends(get_db)):
+    service = RBACService(db)
+    results = service.apply_batch([operation.model_dump() for operation in data.operations])
+    return {"results": results}
+
 @router.get("/check-permission")
 def check_user_permission(user_id: int, module_name: str, permission_name: str, db: Session = Depends(get_db)):
     service = RBACService(db)
     has_permission = service.check_user_permission(user_id, module_name, permission_name)
     return {"has_permission": has_permission}
 
+@router.get("/cache-stats", dependencies=[Depends(require_admin)])
+def get_cache_stats(db: Session = Depends(get_db)):
+    service = RBACService(db)
+    return service.get_cache_stats()
+
+@router.get("/audit-stats", dependencies=[Depends(require_admin)])
+def get_audit_stats():
+    return audit_buffer.stats()
+
+@router.post("/check-permissions", response_model=CheckPermissionsResponse)
+def check_user_permissions(data: CheckPermissionsRequest, db: Session = Depends(get_db)):
+    service = RBACService(db)
+    checks = [(item.user_id, item.module, item.action) for item in data.checks]
+    return {"results": service.check_user_permissions(checks)}
+
 @router.delete("/roles/{role_id}")
 def delete_role(role_id: int, db: Session = Depends(get_db)):
     service = RBACService(db)
@@ -1,27 +1,76 @@
-from schemas.users import UserResponse, PaginatedUserResponse  # Pydantic response model for users
+from schemas.users import UserResponse, PaginatedUserResponse, UserImportResponse, partial_user_response, partial_paginated_user_response  # Pydantic response model for users
 from services.rbac import RBACService
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+import anyio
 from sqlalchemy.orm import Session
 from middleware.dependencies import get_db, get_current_user
-from services.user import UserService, UserCreate, UserUpdate
+from middleware.permissions import has_permission
+from middleware.http_cache import cache_headers, latest_modified, make_etag, not_modified
+from services.permission_cache import permission_cache
+from services.password_hashing import password_hasher
+from services.user import UserService, UserCreate, UserUpdate, user_load_options
+from services.user_import import PARSERS, UserImportService, decode_lines
+from services.pagination import count_mode, decode_cursor, next_page
+from services.export import EXPORT_MEDIA_TYPES, USER_EXPORT_COLUMNS, stream_export, user_export_chunks
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 # Endpoint: Create a new user (Root/Admin only)
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
+    request: Request,
     user_data: UserCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    role_service = RBACService(db)
     # Check permission strictly by RBAC
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("user", [])
-    if "user.create" not in actions:
+    if not await run_in_threadpool(has_permission, request, db, current_user.id, "user", "user.create"):
         raise HTTPException(status_code=403, detail="You don't have permission to create users")
+    # Username trùng -> 409 ngay, không chiếm slot của process pool hash
+    await run_in_threadpool(UserService(db).ensure_username_available, user_data.username)
+    # bcrypt chạy trong process pool; phần DB chạy trong threadpool để không chặn event loop
+    hashed_password = await password_hasher.hash(user_data.password)
+    return await run_in_threadpool(_create_user, db, user_data, hashed_password)
+
+
+USER_FIELDS = frozenset(UserResponse.model_fields)
+
+
+def _parse_fields(fields: str | None) -> frozenset | None:
+    """?fields=id,username,status -> tập field được chọn (luôn kèm id); None = đầy đủ"""
+    if not fields:
+        return None
+    requested = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = requested - USER_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested | {"id"}
+
+
+def _user_payload(user, access=None, fields: frozenset | None = None) -> dict:
+    """
+    Dict cho UserResponse từ User (roles lấy qua quan hệ User.roles, đã eager-load nếu có thể).
+    fields: chỉ tính và trả về các field này; không chạm vào cột/quan hệ chưa được nạp.
+    """
+    # Truy cập user.id trước để nạp lại instance đã expire sau commit
+    user.id
+    user_dict = user.__dict__.copy()
+    if fields is None or "roles" in fields:
+        user_dict["roles"] = [role.name for role in user.roles]
+    if access is not None:
+        user_dict["permissions"] = {module: list(actions) for module, actions in access.permissions.items()}
+    if fields is None or "status" in fields:
+        user_dict["status"] = "active" if getattr(user, "is_active", 1) == 1 else "inactive"
+    if fields is None:
+        return user_dict
+    return {name: value for name, value in user_dict.items() if name in fields}
+
+
+def _create_user(db: Session, user_data: UserCreate, hashed_password: str) -> UserResponse:
     service = UserService(db)
-    user = service.create_user(user_data)
+    user = service.create_user(user_data, hashed_password=hashed_password)
     # Ensure user has at least one role assigned if role is provided in user_data
     from database.models.auth_models import UserRole, Role
     if hasattr(user_data, 'role') and user_data.role:
@@ -33,111 +82,176 @@ def create_user(
             if not existing:
                 db.add(UserRole(user_id=user.id, role_id=role_obj.id))
                 db.commit()
-    # Lấy roles dạng mảng
-    user_roles = db.query(UserRole).filter_by(user_id=user.id).all()
-    role_ids = [ur.role_id for ur in user_roles]
-    roles = db.query(Role).filter(Role.id.in_(role_ids)).all() if role_ids else []
-    user_dict = user.__dict__.copy()
-    user_dict["roles"] = [r.name for r in roles] if roles else []
-    return UserResponse(**user_dict)
+    return UserResponse(**_user_payload(user))
+
+# Endpoint: Import user hàng loạt từ CSV (có header) hoặc NDJSON, đọc body theo luồng
+@router.post("/import", response_model=UserImportResponse)
+async def import_users(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|ndjson)$", description="Mặc định suy ra từ Content-Type"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    if not await run_in_threadpool(has_permission, request, db, current_user.id, "user", "user.create"):
+        raise HTTPException(status_code=403, detail="You don't have permission to create users")
+    if format is None:
+        format = "ndjson" if "json" in request.headers.get("content-type", "") else "csv"
+    allow_root = await run_in_threadpool(RBACService(db).is_root, current_user)
+    # Toàn bộ import (DB + hash) chạy trong 1 worker thread, kéo body từ event loop theo từng chunk
+    return await run_in_threadpool(_import_users, db, request, format, allow_root)
+
+
+def _iter_body_lines(request: Request):
+    """Đọc body request từ worker thread, trả về từng dòng (bytes) mà không nạp cả file vào bộ nhớ"""
+    stream = request.stream()
+    buffer = b""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            break
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if buffer:
+        yield buffer
+
+
+def _import_users(db: Session, request: Request, format: str, allow_root: bool) -> dict:
+    lines = decode_lines(_iter_body_lines(request))
+    return UserImportService(db, allow_root=allow_root).import_rows(PARSERS[format](lines))
 
 # Endpoint: Retrieve profile for the currently logged-in user
 @router.get("/me", response_model=UserResponse)
 def get_my_profile(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    # RBAC: build permissions từ role/privileges
-    role_service = RBACService(db)
-    user_dict = current_user.__dict__.copy()
-    user_dict["permissions"] = role_service.get_user_permissions(current_user.id)
-    # Chuẩn RBAC: trả về roles là mảng tên role
-    from database.models.auth_models import UserRole, Role
-    user_roles = db.query(UserRole).filter_by(user_id=current_user.id).all()
-    role_ids = [ur.role_id for ur in user_roles]
-    roles = db.query(Role).filter(Role.id.in_(role_ids)).all() if role_ids else []
-    user_dict["roles"] = [r.name for r in roles]
-    return UserResponse(**user_dict)
+    service = UserService(db)
+    # Phiên bản = users.version + version RBAC dùng chung (roles/quyền), đọc TRƯỚC khi load dữ liệu
+    # để dữ liệu cũ không bao giờ mang ETag mới. Gán role không đổi users.updated_at nên
+    # Last-Modified lấy mốc mới hơn giữa updated_at và lần thay đổi RBAC gần nhất.
+    stamp, rbac_changed_at = permission_cache.stamp(), permission_cache.changed_at
+    cache_version = service.get_cache_version(current_user.id)
+    if cache_version is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    etag = make_etag("users.me", current_user.id, cache_version.version, stamp)
+    last_modified = latest_modified(cache_version.updated_at, rbac_changed_at)
+    cached = not_modified(request, etag, last_modified)
+    if cached is not None:
+        return cached
+    # Roles + quyền của user trong 2 query (users ⋈ roles, role_permissions)
+    user = service.get_user_with_roles(current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    response.headers.update(cache_headers(etag, last_modified))
+    return UserResponse(**_user_payload(user, RBACService(db).access_from_roles(user.roles)))
 
 # Endpoint: Retrieve a list of users (Admin/Root only)
 @router.get("/", response_model=PaginatedUserResponse)
 def list_users(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     search: str = Query("", description="Search by username or email"),
+    sort: str = Query("id", description="id | created_at, prefix '-' for descending"),
+    after: str | None = Query(None, description="Cursor from next_cursor; replaces page"),
+    include_total: bool = Query(True, description="Skip the count when false"),
+    approximate_total: bool = Query(False, description="Estimate the total from table statistics when not searching"),
+    fields: str | None = Query(None, description="Comma-separated subset of fields, e.g. id,username,status"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
+    selected = _parse_fields(fields)
     role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("user", [])
-    if "user.view" not in actions:
+    if not has_permission(request, db, current_user.id, "user", "user.view"):
         raise HTTPException(status_code=403, detail="You don't have permission to view users")
     service = UserService(db)
     skip = (page - 1) * page_size
-    users = service.list_users(skip=skip, limit=page_size, search=search)
-    total = service.count_users(search=search)
+    try:
+        cursor = decode_cursor(after, sort) if after else None
+        # Trang và tổng số trong 1 câu SQL (window count), hoặc tổng từ cache / ước lượng;
+        # lấy dư 1 dòng để biết còn trang sau hay không
+        users, total = service.list_users_with_total(
+            skip=skip, limit=page_size + 1, search=search, sort=sort, after=cursor,
+            count=count_mode(include_total, approximate_total),
+            # Chỉ SELECT cột được chọn (kèm cột sắp xếp cho cursor), chỉ nạp roles/quyền khi cần
+            options=user_load_options(selected, extra_columns=(sort.lstrip("-"),)),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    users, next_cursor = next_page(users, page_size, sort, sort.lstrip("-"))
+    # Roles + quyền của cả trang đã được nạp sẵn (selectinload), không query thêm theo từng user;
+    # bỏ hẳn phần resolve quyền / quyền quản lý khi không được yêu cầu
+    want_permissions = selected is None or "permissions" in selected
+    want_can_manage = selected is None or "can_manage" in selected
+    accesses = {}
+    if want_permissions or want_can_manage:
+        accesses = {u.id: role_service.access_from_roles(u.roles, with_permissions=want_permissions) for u in users}
+    manageable_ids = role_service.get_manageable_user_ids(current_user, list(accesses), accesses) if want_can_manage else set()
     result = []
-    from database.models.auth_models import UserRole, Role
     for u in users:
-        status = "active" if getattr(u, "is_active", 1) == 1 else "inactive"
-        role_service = RBACService(db)
-        if hasattr(u, "id") and isinstance(u.id, int):
-            permissions = role_service.get_user_permissions(u.id)
-        else:
-            permissions = {}
-        # Lấy roles dạng mảng
-        user_roles = db.query(UserRole).filter_by(user_id=u.id).all()
-        role_ids = [ur.role_id for ur in user_roles]
-        roles = db.query(Role).filter(Role.id.in_(role_ids)).all() if role_ids else []
-        user_dict = u.__dict__.copy()
-        user_dict["roles"] = [r.name for r in roles]
-        user_dict["permissions"] = permissions
-        user_dict["status"] = status
-        result.append(UserResponse(**user_dict))
-    return {
+        user_dict = _user_payload(u, accesses[u.id] if want_permissions else None, selected)
+        if want_can_manage:
+            user_dict["can_manage"] = u.id in manageable_ids
+        result.append(user_dict if selected else UserResponse(**user_dict))
+    payload = {
         "data": result,
         "total": total,
-        "page": page,
-        "page_size": page_size
+        "page": None if after else page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
     }
+    if selected is None:
+        return payload
+    return JSONResponse(partial_paginated_user_response(selected)(**payload).model_dump(mode="json"))
+
+# Endpoint: Export toàn bộ user (NDJSON/CSV) theo luồng, bộ nhớ không phụ thuộc kích thước bảng
+@router.get("/export")
+def export_users(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    search: str = Query("", description="Search by username or email"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    if not has_permission(request, db, current_user.id, "user", "user.view"):
+        raise HTTPException(status_code=403, detail="You don't have permission to view users")
+    return StreamingResponse(
+        stream_export(user_export_chunks, format, USER_EXPORT_COLUMNS, search=search),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
 
 # Endpoint: Retrieve user details by ID (Root/Admin có thể xem theo cấp độ)
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(
+    request: Request,
     user_id: int,
+    fields: str | None = Query(None, description="Comma-separated subset of fields, e.g. id,username,status"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
+    selected = _parse_fields(fields)
     service = UserService(db)
     role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("user", [])
-    if "user.view" not in actions:
+    if not has_permission(request, db, current_user.id, "user", "user.view"):
         raise HTTPException(status_code=403, detail="You don't have permission to view user details")
-    user = service.get_user(user_id)
+    user = service.get_user_with_roles(user_id, selected)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    status = "active" if getattr(user, "is_active", 1) == 1 else "inactive"
-    role_service = RBACService(db)
-    if hasattr(user, "id") and isinstance(user.id, int):
-        permissions = role_service.get_user_permissions(user.id)
-    else:
-        permissions = {}
-    # Lấy roles dạng mảng
-    from database.models.auth_models import UserRole, Role
-    user_roles = db.query(UserRole).filter_by(user_id=user.id).all()
-    role_ids = [ur.role_id for ur in user_roles]
-    roles = db.query(Role).filter(Role.id.in_(role_ids)).all() if role_ids else []
-    user_dict = user.__dict__.copy()
-    user_dict["roles"] = [r.name for r in roles]
-    user_dict["permissions"] = permissions
-    user_dict["status"] = status
-    return UserResponse(**user_dict)
+    if selected is None:
+        return UserResponse(**_user_payload(user, role_service.access_from_roles(user.roles)))
+    access = role_service.access_from_roles(user.roles) if "permissions" in selected else None
+    return JSONResponse(partial_user_response(selected)(**_user_payload(user, access, selected)).model_dump(mode="json"))
 
 # Endpoint: Update user details by ID (Root/Admin có thể quản lý theo cấp độ)
 @router.put("/{user_id}", response_model=UserResponse)
 def update_user(
+    request: Request,
     user_id: int,
     update_data: UserUpdate,
     db: Session = Depends(get_db),
@@ -145,9 +259,7 @@ def update_user(
 ):
     service = UserService(db)
     role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("user", [])
-    if "user.update" not in actions:
+    if not has_permission(request, db, current_user.id, "user", "user.update"):
         raise HTTPException(status_code=403, detail="You don't have permission to update users")
     user = service.get_user(user_id)
     if not user:
@@ -158,29 +270,20 @@ def update_user(
     elif update_data.role == "root":
         raise HTTPException(status_code=403, detail="Không được gán role là root")
     updated_user = service.update_user(user_id, update_data)
-    # Lấy roles dạng mảng giống các API khác
-    from database.models.auth_models import UserRole, Role
     if updated_user is None:
         raise HTTPException(status_code=404, detail="User not found after update")
-    user_roles = db.query(UserRole).filter_by(user_id=getattr(updated_user, "id", None)).all()
-    role_ids = [ur.role_id for ur in user_roles]
-    roles = db.query(Role).filter(Role.id.in_(role_ids)).all() if role_ids else []
-    user_dict = updated_user.__dict__.copy()
-    user_dict["roles"] = [r.name for r in roles]
-    return UserResponse(**user_dict)
+    return UserResponse(**_user_payload(updated_user))
 
 # Endpoint: Delete a user by ID (Root có thể xóa tất cả, Admin chỉ xóa user)
 @router.delete("/{user_id}", status_code=status.HTTP_200_OK)
 def delete_user(
+    request: Request,
     user_id: int,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     service = UserService(db)
-    role_service = RBACService(db)
-    perms = role_service.get_user_permissions(current_user.id)
-    actions = perms.get("user", [])
-    if "user.delete" not in actions:
+    if not has_permission(request, db, current_user.id, "user", "user.delete"):
         raise HTTPException(status_code=403, detail="You don't have permission to delete users")
     user = service.get_user(user_id)
     if not user:
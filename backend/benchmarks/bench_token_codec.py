@@ -0,0 +1,70 @@
+"""
+Benchmark: throughput encode/decode access token của TokenCodec (key HMAC và header tính sẵn)
+so với python-jose (nếu còn cài), với claims giống token app phát hành.
+
+Chạy từ thư mục backend:
+    python -m benchmarks.bench_token_codec --iterations 50000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from services.token_codec import TokenCodec
+
+try:
+    from jose import jwt as jose_jwt
+except ImportError:  # python-jose không còn là dependency của app
+    jose_jwt = None
+
+SECRET = "benchmark-secret-key"
+ALGORITHM = "HS256"
+
+
+def sample_claims() -> dict:
+    return {
+        "sub": "12345",
+        "role": "admin",
+        "rv": "1a2b3c4d.42",
+        "pm": "1:1e,2:1e0,3:1e00",
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=30),
+    }
+
+
+def throughput(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    codec = TokenCodec(SECRET, ALGORITHM)
+    claims = sample_claims()
+    token = codec.encode(claims)
+
+    rows = [
+        ("encode (TokenCodec)", lambda: codec.encode(claims)),
+        ("decode (TokenCodec)", lambda: codec.decode(token)),
+    ]
+    if jose_jwt is not None:
+        # Token 2 bên phải giống nhau từng byte
+        assert jose_jwt.encode(claims, SECRET, algorithm=ALGORITHM) == token
+        rows += [
+            ("encode (python-jose)", lambda: jose_jwt.encode(claims, SECRET, algorithm=ALGORITHM)),
+            ("decode (python-jose)", lambda: jose_jwt.decode(token, SECRET, algorithms=[ALGORITHM])),
+        ]
+    else:
+        print("python-jose not installed, skipping comparison")
+
+    print(f"{'case':<24}{'ops/s':>12}{'us/op':>10}")
+    for name, fn in rows:
+        ops = throughput(fn, args.iterations)
+        print(f"{name:<24}{ops:>12.0f}{1e6 / ops:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
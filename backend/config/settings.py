@@ -20,6 +20,33 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 43200
+    PERMISSION_CACHE_SIZE: int = 10000
+    JWT_PERMISSION_SNAPSHOT: bool = False
+    AUDIT_ENABLED: bool = True
+    AUDIT_BUFFER_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    RBAC_INVALIDATION_CHANNEL: str = "rbac_invalidation"
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_HASH_ROUNDS: int = 12  # bcrypt: log2 cost; chọn bằng python -m scripts.calibrate_password_hash
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = số CPU
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    PASSWORD_HASH_BULK_WORKERS: int = 0  # Số hash import chạy đồng thời trên pool; 0 = nửa số worker
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 300
+    VERIFIED_TOKEN_CACHE_SIZE: int = 4096
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "local"  # local (trong process) | database (bảng rate_limit_buckets, chung mọi worker)
+    RATE_LIMIT_AUTH_PER_IP: int = 30
+    RATE_LIMIT_AUTH_PER_USER: int = 10
+    RATE_LIMIT_PERIOD_SECONDS: float = 60.0
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    REVOCATION_INDEX_CAPACITY: int = 100000
+    REVOCATION_SYNC_INTERVAL_SECONDS: float = 5.0
+    USER_IMPORT_BATCH_SIZE: int = 500
+    LIST_TOTAL_CACHE_SIZE: int = 1024
+    LIST_TOTAL_CACHE_TTL_SECONDS: float = 30
+    EXPORT_CHUNK_SIZE: int = 1000
 
 
     class Config:
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from config.settings import settings
 
@@ -7,6 +7,14 @@ DATABASE_URL = settings.DATABASE_URL
 # Create the database engine (establish connection with the database)
 engine = create_engine(DATABASE_URL, echo=True, future=True)
 
+if engine.dialect.name == "sqlite":
+    # SQLite mặc định không kiểm tra foreign key (và không chạy ON DELETE CASCADE)
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 # Create a session factory (create local sessions for CRUD operations)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,7 +1,7 @@
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
-from database.models import auth_models, demos
+from database.models import auth_models, demos, audit, rate_limit, revoked_token
 from alembic import context
 from config.settings import settings
 from database.models.base import Base
@@ -0,0 +1,40 @@
+"""Add refresh_families table, drop per-rotation jti revocations
+
+Revision ID: 0b9e6c3d7f21
+Revises: f5d20b7e3a16
+Create Date: 2026-10-18 20:41:09.327718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b9e6c3d7f21'
+down_revision: Union[str, None] = 'f5d20b7e3a16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('refresh_families',
+    sa.Column('family', sa.String(length=32), nullable=False),
+    sa.Column('current_jti', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('family')
+    )
+    op.create_index(op.f('ix_refresh_families_user_id'), 'refresh_families', ['user_id'], unique=False)
+    op.create_index(op.f('ix_refresh_families_expires_at'), 'refresh_families', ['expires_at'], unique=False)
+    # jti đã dùng giờ được theo dõi bằng current_jti của family, không còn ghi vào revoked_tokens
+    op.execute("DELETE FROM revoked_tokens WHERE kind = 'jti'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_refresh_families_expires_at'), table_name='refresh_families')
+    op.drop_index(op.f('ix_refresh_families_user_id'), table_name='refresh_families')
+    op.drop_table('refresh_families')
@@ -0,0 +1,32 @@
+"""Add composite indexes for keyset pagination on users and demos
+
+Revision ID: 2c6d8e1f4a93
+Revises: e91f3a4c6b28
+Create Date: 2026-10-18 16:02:51.307716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c6d8e1f4a93'
+down_revision: Union[str, None] = 'e91f3a4c6b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+    op.create_index('ix_demos_created_at_id', 'demos', ['created_at', 'id'], unique=False)
+    op.create_index('ix_demos_title_id', 'demos', ['title', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_demos_title_id', table_name='demos')
+    op.drop_index('ix_demos_created_at_id', table_name='demos')
+    op.drop_index('ix_users_created_at_id', table_name='users')
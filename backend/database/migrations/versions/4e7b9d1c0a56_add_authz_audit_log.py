@@ -0,0 +1,43 @@
+"""Add authz_audit_log table
+
+Revision ID: 4e7b9d1c0a56
+Revises: d3a81f5c2e07
+Create Date: 2026-10-18 11:15:03.671920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7b9d1c0a56'
+down_revision: Union[str, None] = 'd3a81f5c2e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('authz_audit_log',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('module', sa.String(length=50), nullable=False),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('allowed', sa.Boolean(), nullable=False),
+    sa.Column('source', sa.String(length=20), nullable=False),
+    sa.Column('method', sa.String(length=10), nullable=True),
+    sa.Column('path', sa.String(length=255), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_authz_audit_log_created_at'), 'authz_audit_log', ['created_at'], unique=False)
+    op.create_index(op.f('ix_authz_audit_log_user_id'), 'authz_audit_log', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_authz_audit_log_user_id'), table_name='authz_audit_log')
+    op.drop_index(op.f('ix_authz_audit_log_created_at'), table_name='authz_audit_log')
+    op.drop_table('authz_audit_log')
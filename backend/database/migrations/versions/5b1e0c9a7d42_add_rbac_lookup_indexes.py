@@ -0,0 +1,30 @@
+"""Add lookup indexes on user_roles and role_permissions
+
+Revision ID: 5b1e0c9a7d42
+Revises: 307421c7762c
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e0c9a7d42'
+down_revision: Union[str, None] = '307421c7762c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_user_roles_user_role', 'user_roles', ['user_id', 'role_id'], unique=False)
+    op.create_index('ix_role_permissions_role_module_permission', 'role_permissions', ['role_id', 'module_id', 'permission_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_role_permissions_role_module_permission', table_name='role_permissions')
+    op.drop_index('ix_user_roles_user_role', table_name='user_roles')
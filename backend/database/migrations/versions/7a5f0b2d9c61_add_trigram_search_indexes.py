@@ -0,0 +1,43 @@
+"""Add pg_trgm GIN indexes for substring search on users and demos
+
+Revision ID: 7a5f0b2d9c61
+Revises: 2c6d8e1f4a93
+Create Date: 2026-10-18 16:41:09.582364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a5f0b2d9c61'
+down_revision: Union[str, None] = '2c6d8e1f4a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRGM_INDEXES = [
+    ('ix_users_username_trgm', 'users', 'username'),
+    ('ix_users_email_trgm', 'users', 'email'),
+    ('ix_demos_title_trgm', 'demos', 'title'),
+    ('ix_demos_description_trgm', 'demos', 'description'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRGM_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, _column in reversed(TRGM_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,30 @@
+"""Add row version to users and demos
+
+Revision ID: 8d3f1a6c5e40
+Revises: 0b9e6c3d7f21
+Create Date: 2026-10-18 21:15:52.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f1a6c5e40'
+down_revision: Union[str, None] = '0b9e6c3d7f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('demos', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('demos', 'version')
+    op.drop_column('users', 'version')
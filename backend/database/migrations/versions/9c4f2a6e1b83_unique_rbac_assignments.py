@@ -0,0 +1,44 @@
+"""Make user_roles and role_permissions assignments unique
+
+Revision ID: 9c4f2a6e1b83
+Revises: 5b1e0c9a7d42
+Create Date: 2026-10-18 10:02:11.540317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4f2a6e1b83'
+down_revision: Union[str, None] = '5b1e0c9a7d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Xoá bản ghi trùng (giữ id nhỏ nhất) trước khi thêm unique index cho ON CONFLICT
+    op.execute("""
+        DELETE FROM user_roles a USING user_roles b
+        WHERE a.user_id = b.user_id AND a.role_id = b.role_id AND a.id > b.id
+    """)
+    op.execute("""
+        DELETE FROM role_permissions a USING role_permissions b
+        WHERE a.role_id = b.role_id AND a.module_id = b.module_id
+          AND a.permission_id = b.permission_id AND a.id > b.id
+    """)
+    op.drop_index('ix_user_roles_user_role', table_name='user_roles')
+    op.create_index('ix_user_roles_user_role', 'user_roles', ['user_id', 'role_id'], unique=True)
+    op.drop_index('ix_role_permissions_role_module_permission', table_name='role_permissions')
+    op.create_index('ix_role_permissions_role_module_permission', 'role_permissions', ['role_id', 'module_id', 'permission_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_role_permissions_role_module_permission', table_name='role_permissions')
+    op.create_index('ix_role_permissions_role_module_permission', 'role_permissions', ['role_id', 'module_id', 'permission_id'], unique=False)
+    op.drop_index('ix_user_roles_user_role', table_name='user_roles')
+    op.create_index('ix_user_roles_user_role', 'user_roles', ['user_id', 'role_id'], unique=False)
@@ -0,0 +1,34 @@
+"""Add rate_limit_buckets table
+
+Revision ID: b7c2e5f80d14
+Revises: 4e7b9d1c0a56
+Create Date: 2026-10-18 14:32:47.208315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c2e5f80d14'
+down_revision: Union[str, None] = '4e7b9d1c0a56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limit_buckets',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('tat', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_rate_limit_buckets_tat'), 'rate_limit_buckets', ['tat'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_rate_limit_buckets_tat'), table_name='rate_limit_buckets')
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,41 @@
+"""Add foreign keys with ON DELETE CASCADE to user_roles and role_permissions
+
+Revision ID: c48e7a2b5d19
+Revises: 7a5f0b2d9c61
+Create Date: 2026-10-18 17:20:44.916032
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c48e7a2b5d19'
+down_revision: Union[str, None] = '7a5f0b2d9c61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FOREIGN_KEYS = [
+    ('fk_user_roles_user_id_users', 'user_roles', 'users', 'user_id'),
+    ('fk_user_roles_role_id_roles', 'user_roles', 'roles', 'role_id'),
+    ('fk_role_permissions_role_id_roles', 'role_permissions', 'roles', 'role_id'),
+    ('fk_role_permissions_module_id_modules', 'role_permissions', 'modules', 'module_id'),
+    ('fk_role_permissions_permission_id_permissions', 'role_permissions', 'permissions', 'permission_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Xoá dòng mồ côi (vd. user_roles của user đã bị xoá) trước khi thêm ràng buộc
+    for _name, table, referred, column in FOREIGN_KEYS:
+        op.execute(f'DELETE FROM {table} WHERE {column} NOT IN (SELECT id FROM {referred})')
+    for name, table, referred, column in FOREIGN_KEYS:
+        op.create_foreign_key(name, table, referred, [column], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _referred, _column in reversed(FOREIGN_KEYS):
+        op.drop_constraint(name, table, type_='foreignkey')
@@ -0,0 +1,32 @@
+"""Add rank to roles
+
+Revision ID: d3a81f5c2e07
+Revises: 9c4f2a6e1b83
+Create Date: 2026-10-18 10:40:52.207719
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a81f5c2e07'
+down_revision: Union[str, None] = '9c4f2a6e1b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('roles', sa.Column('rank', sa.Integer(), server_default='0', nullable=False))
+    # Thứ bậc của các role mặc định (xem services/rbac.py: ROOT_RANK, ADMIN_RANK, USER_RANK)
+    op.execute("UPDATE roles SET rank = 100 WHERE name = 'root'")
+    op.execute("UPDATE roles SET rank = 50 WHERE name = 'admin'")
+    op.execute("UPDATE roles SET rank = 10 WHERE name = 'user'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('roles', 'rank')
@@ -0,0 +1,34 @@
+"""Add rbac_version table
+
+Revision ID: f5d20b7e3a16
+Revises: c48e7a2b5d19
+Create Date: 2026-10-18 19:02:37.184522
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5d20b7e3a16'
+down_revision: Union[str, None] = 'c48e7a2b5d19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rbac_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO rbac_version (id, version, changed_at) VALUES (1, 0, now())")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rbac_version')
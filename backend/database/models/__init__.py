@@ -1,2 +1,7 @@
 from .auth_models import User, Role, Module, Permission, RolePermission, UserRole
-from .demos import Demo
\ No newline at end of file
+from .demos import Demo
+from .audit import AuthzAuditLog
+from .rate_limit import RateLimitBucket
+from .revoked_token import RevokedToken
+from .rbac_version import RBACVersion
+from .refresh_family import RefreshFamily
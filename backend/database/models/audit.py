@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime
+from database.models.base import Base
+
+
+class AuthzAuditLog(Base):
+    __tablename__ = "authz_audit_log"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Thời điểm ra quyết định
+    user_id = Column(Integer, nullable=True, index=True)
+    module = Column(String(50), nullable=False)
+    action = Column(String(50), nullable=False)
+    allowed = Column(Boolean, nullable=False)
+    source = Column(String(20), nullable=False)  # token (snapshot trong JWT) | rbac (cache/DB)
+    method = Column(String(10), nullable=True)
+    path = Column(String(255), nullable=True)
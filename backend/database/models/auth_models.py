@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, Index, ForeignKey, func
+from sqlalchemy.orm import relationship
 from database.models.base import Base
 
 class User(Base):
@@ -13,12 +14,29 @@ class User(Base):
     role = Column(String(50), default="user")
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    # Tăng ở mọi lần sửa, nguồn của ETag mạnh (xem Demo.version)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+    # Chỉ đọc: gán/bỏ role đi qua RBACService (INSERT ... ON CONFLICT trên user_roles)
+    roles = relationship("Role", secondary="user_roles", order_by="Role.id", viewonly=True)
+    __table_args__ = (
+        # Keyset pagination theo created_at (id làm khóa phụ cho thứ tự ổn định)
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Tìm kiếm chuỗi con (ILIKE '%term%') trên Postgres; cần extension pg_trgm
+        Index("ix_users_username_trgm", "username", postgresql_using="gin",
+              postgresql_ops={"username": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_email_trgm", "email", postgresql_using="gin",
+              postgresql_ops={"email": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
 
 class Role(Base):
     __tablename__ = "roles"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=True, nullable=False)
     description = Column(Text, nullable=True)
+    rank = Column(Integer, nullable=False, default=0, server_default="0")  # root=100, admin=50, user=10
+    permissions = relationship("RolePermission", back_populates="role", cascade="all, delete-orphan", passive_deletes=True)
+    users = relationship("User", secondary="user_roles", viewonly=True)
 
 class Module(Base):
     __tablename__ = "modules"
@@ -35,12 +53,24 @@ class Permission(Base):
 class RolePermission(Base):
     __tablename__ = "role_permissions"
     id = Column(Integer, primary_key=True, index=True)
-    role_id = Column(Integer, nullable=False)
-    module_id = Column(Integer, nullable=False)
-    permission_id = Column(Integer, nullable=False)
+    role_id = Column(Integer, ForeignKey("roles.id", ondelete="CASCADE", name="fk_role_permissions_role_id_roles"), nullable=False)
+    module_id = Column(Integer, ForeignKey("modules.id", ondelete="CASCADE", name="fk_role_permissions_module_id_modules"), nullable=False)
+    permission_id = Column(Integer, ForeignKey("permissions.id", ondelete="CASCADE", name="fk_role_permissions_permission_id_permissions"), nullable=False)
+    role = relationship("Role", back_populates="permissions")
+    # Tên module/permission thường lấy từ rbac_registry (trong bộ nhớ), không cần load các quan hệ này
+    module = relationship("Module")
+    permission = relationship("Permission")
+    __table_args__ = (
+        Index("ix_role_permissions_role_module_permission", "role_id", "module_id", "permission_id", unique=True),
+    )
 
 class UserRole(Base):
     __tablename__ = "user_roles"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, nullable=False)
-    role_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE", name="fk_user_roles_user_id_users"), nullable=False)
+    role_id = Column(Integer, ForeignKey("roles.id", ondelete="CASCADE", name="fk_user_roles_role_id_roles"), nullable=False)
+    user = relationship("User")
+    role = relationship("Role")
+    __table_args__ = (
+        Index("ix_user_roles_user_role", "user_id", "role_id", unique=True),
+    )
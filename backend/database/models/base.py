@@ -1,3 +1,11 @@
+from sqlalchemy import DDL, event
 from sqlalchemy.orm import declarative_base
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+# Index trigram (gin_trgm_ops) cần extension pg_trgm trước khi create_all tạo bảng
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from database.models.base import Base
 
@@ -11,3 +11,17 @@ class Demo(Base):
     description = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Tăng ở mọi lần sửa (ORM tự tăng khi flush; UPDATE hàng loạt phải tự cộng 1): nguồn của ETag mạnh,
+    # updated_at chỉ chính xác tới giây trên SQLite nên chỉ dùng cho Last-Modified
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = (
+        # Keyset pagination: (cột sắp xếp, id) để thứ tự ổn định khi trùng giá trị
+        Index("ix_demos_created_at_id", "created_at", "id"),
+        Index("ix_demos_title_id", "title", "id"),
+        # Tìm kiếm chuỗi con (ILIKE '%term%') trên Postgres; cần extension pg_trgm
+        Index("ix_demos_title_trgm", "title", postgresql_using="gin",
+              postgresql_ops={"title": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_demos_description_trgm", "description", postgresql_using="gin",
+              postgresql_ops={"description": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
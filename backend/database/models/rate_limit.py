@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, Float
+from database.models.base import Base
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(255), primary_key=True)  # vd. "ip:10.0.0.1", "user:alice"
+    tat = Column(Float, nullable=False, index=True)  # GCRA theoretical arrival time (epoch giây)
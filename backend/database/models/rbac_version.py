@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime
+from database.models.base import Base
+
+RBAC_VERSION_ROW_ID = 1
+
+
+class RBACVersion(Base):
+    """1 dòng duy nhất: version RBAC dùng chung giữa các worker, tăng trong cùng transaction với mọi thay đổi RBAC"""
+    __tablename__ = "rbac_version"
+
+    id = Column(Integer, primary_key=True)  # Luôn là RBAC_VERSION_ROW_ID
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    changed_at = Column(DateTime(timezone=True), nullable=False)  # Thời điểm thay đổi RBAC gần nhất
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from database.models.base import Base
+
+
+class RefreshFamily(Base):
+    """
+    1 dòng cho mỗi chuỗi xoay vòng refresh token (1 lần đăng nhập): chỉ jti hiện tại là dùng được.
+    Xoay vòng = compare-and-set current_jti; jti khác được trình ra nghĩa là token cũ bị dùng lại.
+    """
+    __tablename__ = "refresh_families"
+
+    family = Column(String(32), primary_key=True)
+    current_jti = Column(String(32), nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # exp của refresh token hiện tại
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index
+from database.models.base import Base
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        Index("ix_revoked_tokens_kind_value", "kind", "value", unique=True),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)  # Con trỏ đồng bộ tăng dần
+    kind = Column(String(10), nullable=False)  # family (cả chuỗi xoay vòng) | user (mọi token trước revoked_at)
+    value = Column(String(64), nullable=False)
+    user_id = Column(Integer, nullable=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Sau thời điểm này token liên quan đã tự hết hạn
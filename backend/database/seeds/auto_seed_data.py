@@ -1,7 +1,7 @@
 
 # Auto seed base modules and permissions for RBAC
 from database.database import SessionLocal
-from services.rbac import RBACService
+from services.rbac import RBACService, ROOT_RANK, ADMIN_RANK, USER_RANK
 
 # Danh sách module cần seed
 MODULES = [
@@ -19,9 +19,9 @@ BASE_ACTIONS = [
 ]
 
 BASE_ROLES = [
-    ("root", "Super Admin"),
-    ("admin", "Admin"),
-    ("user", "User")
+    ("root", "Super Admin", ROOT_RANK),
+    ("admin", "Admin", ADMIN_RANK),
+    ("user", "User", USER_RANK)
 ]
 
 
@@ -29,16 +29,18 @@ BASE_ROLES = [
 def seed_default_roles():
     from database.models.auth_models import Role
     db = SessionLocal()
-    for name, desc in BASE_ROLES:
+    for name, desc, rank in BASE_ROLES:
         role = db.query(Role).filter_by(name=name).first()
         if not role:
-            db.add(Role(name=name, description=desc))
+            db.add(Role(name=name, description=desc, rank=rank))
+            db.commit()
+        elif not role.rank:
+            role.rank = rank
             db.commit()
     db.close()
 
 
 def seed_modules_and_permissions():
-    from database.models.auth_models import Permission
     db = SessionLocal()
     rbac = RBACService(db)
     for module_name, module_desc in MODULES:
@@ -50,7 +52,7 @@ def seed_modules_and_permissions():
         for action_tuple in BASE_ACTIONS:
             action, action_desc = action_tuple
             perm_name = f"{module_name}.{action}"
-            perm = db.query(Permission).filter_by(name=perm_name).first()
+            perm = rbac.get_permission_by_name(perm_name)
             if not perm:
                 rbac.create_permission(perm_name, f"{action_desc} {module_desc.lower()}")
     db.close()
@@ -132,4 +134,14 @@ def auto_seed_all():
     seed_default_accounts()
     seed_root_admin_permissions()
     seed_default_demos()
+    refresh_rbac_registry()
+
+# Nạp lại registry module/permission sau khi seed
+def refresh_rbac_registry():
+    from services.rbac_registry import rbac_registry
+    db = SessionLocal()
+    try:
+        rbac_registry.load(db)
+    finally:
+        db.close()
 
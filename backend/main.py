@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+import asyncio
 import logging
 from logging.handlers import TimedRotatingFileHandler
 import os
@@ -10,6 +11,7 @@ from database.database import engine, SessionLocal
 from database.models.base import Base
 from database.models.auth_models import User
 from services.user import UserService, UserCreate
+from config.settings import settings
 from api import auth, users, demos, rbac
 
 log_dir = "logs"
@@ -31,11 +33,43 @@ async def lifespan(app: FastAPI):
     # Auto seed RBAC (roles, modules, permissions)
     db = SessionLocal()
     try:
+        # Dòng version RBAC phải có trước mọi thay đổi RBAC (kể cả seed bên dưới)
+        from services.rbac_version import ensure_rbac_version_row, load_rbac_version
+        ensure_rbac_version_row(db)
         from database.seeds.auto_seed_data import auto_seed_all
         auto_seed_all()
+        # Registry name <-> id của module/permission (seed đã nạp lại, đảm bảo có trước request đầu tiên)
+        from services.rbac_registry import rbac_registry
+        rbac_registry.ensure_loaded(db)
+        # Version RBAC dùng chung (stamp của snapshot quyền trong token và ETag)
+        load_rbac_version(db)
+        # Chỉ mục refresh token đã thu hồi: dựng 1 lần rồi đồng bộ tăng dần
+        from services.token_revocation import revocation_index
+        revocation_index.rebuild(db)
     finally:
         db.close()
+    revocation_task = asyncio.create_task(revocation_index.run(settings.REVOCATION_SYNC_INTERVAL_SECONDS))
+    # Task nền ghi audit log phân quyền theo lô
+    from services.audit import audit_buffer
+    audit_task = asyncio.create_task(audit_buffer.run(settings.AUDIT_FLUSH_INTERVAL_SECONDS))
+    # Nhận NOTIFY vô hiệu cache RBAC/user từ các worker khác (chỉ có với Postgres)
+    invalidation_listener = None
+    if engine.dialect.name == "postgresql":
+        from services.invalidation import InvalidationListener
+        invalidation_listener = InvalidationListener(engine)
+        invalidation_listener.start()
     yield
+    # Dừng process pool hash mật khẩu (nếu đã được tạo)
+    from services.password_hashing import password_hasher
+    password_hasher.shutdown()
+    if invalidation_listener is not None:
+        invalidation_listener.stop()
+    revocation_task.cancel()
+    audit_task.cancel()
+    try:
+        await audit_task
+    except asyncio.CancelledError:
+        pass
 
 # --- App creation ---
 app = FastAPI(
@@ -88,25 +122,23 @@ app.include_router(rbac.router)
 from fastapi import Request
 import time
 
-from jose import jwt, JWTError
-from config.settings import settings
+from middleware.dependencies import verify_request_token
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
+    # Verify token 1 lần ở đây; get_current_user và phân quyền đọc lại claims từ request.state
+    claims = verify_request_token(request)
     response = await call_next(request)
     process_time = (time.time() - start_time) * 1000
     user_agent = request.headers.get("user-agent", "-")
     client_ip = request.client.host if request.client else "-"
-    user_id = "-"
-    auth_header = request.headers.get("authorization")
-    if auth_header and auth_header.lower().startswith("bearer "):
-        token = auth_header.split(" ", 1)[1]
-        try:
-            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-            user_id = payload.get("sub", "-")
-        except JWTError:
-            user_id = "invalid_token"
+    if claims is not None:
+        user_id = claims.get("sub", "-")
+    elif request.state.token_invalid:
+        user_id = "invalid_token"
+    else:
+        user_id = "-"
     logging.info(f"{request.method} {request.url.path} {response.status_code} {process_time:.2f}ms UA={user_agent} IP={client_ip} user_id={user_id}")
     return response
 
@@ -1,11 +1,12 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import Generator
-from jose import JWTError, jwt
-from config.settings import settings
+from security import decode_access_token
+from services.token_codec import TokenError
 from database.database import SessionLocal
-from database.models.auth_models import User
+from services.principal_cache import Principal, principal_cache
+from services.rate_limit import auth_rate_limiter
 
 # Sử dụng HTTPBearer thay vì OAuth2PasswordBearer để đơn giản hơa
 security = HTTPBearer()
@@ -20,22 +21,48 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def verify_request_token(request: Request) -> dict | None:
+    """
+    Stage verify bearer token duy nhất của request: claims (hoặc None nếu không có/không hợp lệ)
+    được lưu ở request.state để middleware log và get_current_user dùng chung, không decode lại.
+    """
+    if hasattr(request.state, "token_claims"):
+        return request.state.token_claims
+    claims = None
+    request.state.token_invalid = False
+    auth_header = request.headers.get("authorization")
+    if auth_header and auth_header.lower().startswith("bearer "):
+        try:
+            claims = decode_access_token(auth_header.split(" ", 1)[1])
+        except TokenError:
+            request.state.token_invalid = True
+    request.state.token_claims = claims
+    return claims
+
+
 # Retrieve user currently logged in
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> User:
+def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+    # credentials (HTTPBearer) đảm bảo có header; claims lấy từ stage verify chung của request
+    payload = verify_request_token(request)
+    if payload is None:
         raise credentials_exception
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise credentials_exception
+    # Principal đã cache -> không chạm bảng users (Session chỉ mở kết nối khi thực sự query)
+    user = principal_cache.load(db, int(user_id))
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+
+async def limit_authenticated_attempts(request: Request):
+    """Rate limit theo IP + user id trong token; đặt trước get_current_user nên không chạm DB"""
+    claims = verify_request_token(request)
+    subject = f"id:{claims['sub']}" if claims and claims.get("sub") else None
+    await auth_rate_limiter.check_async(request, subject)
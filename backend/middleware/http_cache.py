@@ -0,0 +1,65 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+# Dữ liệu theo user/quyền: trình duyệt được lưu nhưng phải hỏi lại server (conditional GET) mỗi lần dùng
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """ETag mạnh từ các thành phần phiên bản (updated_at, stamp RBAC...), không cần serialize body"""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _utc(value: datetime) -> datetime:
+    # Cột TIMESTAMP không timezone lưu giờ UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def latest_modified(*values: datetime | None) -> datetime | None:
+    """Last-Modified của response ghép từ nhiều nguồn: mốc mới nhất (UTC), bỏ qua None"""
+    values = [_utc(value) for value in values if value is not None]
+    return max(values) if values else None
+
+
+def cache_headers(etag: str, last_modified: datetime | None = None, cache_control: str = PRIVATE_REVALIDATE) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_utc(last_modified), usegmt=True)
+    return headers
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match so sánh yếu: bỏ tiền tố W/
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP-date chỉ chính xác tới giây
+    return _utc(last_modified).replace(microsecond=0) <= since
+
+
+def not_modified(request: Request, etag: str, last_modified: datetime | None = None, cache_control: str = PRIVATE_REVALIDATE):
+    """
+    Response 304 nếu client đã có đúng phiên bản (If-None-Match, hoặc If-Modified-Since khi không có
+    If-None-Match), ngược lại None. Gọi sau kiểm tra quyền, trước phần load/serialize tốn kém.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        matched = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        matched = bool(if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified))
+    if matched:
+        return Response(status_code=304, headers=cache_headers(etag, last_modified, cache_control))
+    return None
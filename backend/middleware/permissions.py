@@ -1,18 +1,35 @@
-
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from middleware.dependencies import get_current_user, get_db
 from services.rbac import RBACService
+from services.permission_snapshot import check_snapshot
+from services.audit import record_decision
+
+
+def has_permission(request: Request, db: Session, user_id: int, module: str, action: str) -> bool:
+    """
+    Kiểm tra quyền: ưu tiên snapshot trong token, chỉ hỏi DB/cache khi snapshot không có hoặc đã cũ.
+    Mọi quyết định allow/deny được ghi vào audit buffer (ghi DB bất đồng bộ theo lô).
+    """
+    claims = getattr(request.state, "token_claims", None)
+    if claims is not None:
+        allowed = check_snapshot(claims, db, module, action)
+        if allowed is not None:
+            record_decision(request, user_id, module, action, allowed, "token")
+            return allowed
+    allowed = RBACService(db).check_user_permission(user_id, module, action, warm_cache=True)
+    record_decision(request, user_id, module, action, allowed, "rbac")
+    return allowed
 
 
 # RBAC permission dependency generator (chuẩn RBAC, không dùng privilege cũ)
 def require_permission(module: str, action: str):
     def dependency(
+        request: Request,
         current_user = Depends(get_current_user),
         db: Session = Depends(get_db)
     ):
-        rbac = RBACService(db)
-        if not rbac.check_user_permission(current_user.id, module, action):
+        if not has_permission(request, db, current_user.id, module, action):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"You don't have permission to {action} {module}"
@@ -20,3 +37,8 @@ def require_permission(module: str, action: str):
         return current_user
     return dependency
 
+def require_admin(current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Chỉ admin/root: endpoint vận hành (thống kê cache, hàng đợi...) không được lộ cho user thường"""
+    if not RBACService(db).is_admin_or_above(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -21,6 +21,7 @@ class DemoResponse(BaseModel):
 
 class PaginatedDemoResponse(BaseModel):
     data: List[DemoResponse]
-    total: int
-    page: int
+    total: Optional[int] = None  # None khi include_total=false
+    page: Optional[int] = None  # None khi phân trang bằng cursor
     page_size: int
+    next_cursor: Optional[str] = None  # truyền vào `after` để lấy trang sau; None nếu hết
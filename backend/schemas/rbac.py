@@ -1,7 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, model_validator
+from typing import Optional, List, Literal
 
 class RoleCreate(BaseModel):
+    # Không nhận rank: role tạo qua API luôn có rank 0; rank chỉ do seed/migration đặt
     name: str
     description: Optional[str] = None
 
@@ -30,6 +31,70 @@ class RemovePermissionFromRole(BaseModel):
     permission_id: int
     
     
+class RBACBatchOperation(BaseModel):
+    op: Literal["grant", "revoke", "assign_role"]
+    role_id: int
+    module_id: Optional[int] = None
+    permission_id: Optional[int] = None
+    user_id: Optional[int] = None
+
+class RBACBatchRequest(BaseModel):
+    operations: List[RBACBatchOperation]
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "operations": [
+                    {"op": "grant", "role_id": 4, "module_id": 2, "permission_id": 5},
+                    {"op": "revoke", "role_id": 4, "module_id": 2, "permission_id": 8},
+                    {"op": "assign_role", "role_id": 4, "user_id": 7}
+                ]
+            }
+        }
+
+class RBACBatchResult(BaseModel):
+    index: int
+    op: str
+    status: Literal["applied", "unchanged", "invalid"]
+    detail: Optional[str] = None
+
+class RBACBatchResponse(BaseModel):
+    results: List[RBACBatchResult]
+
+
+class PermissionCheckItem(BaseModel):
+    user_id: Optional[int] = None
+    module: str
+    action: str
+
+class CheckPermissionsRequest(BaseModel):
+    user_id: Optional[int] = None  # Áp dụng cho các item không khai báo user_id
+    checks: List[PermissionCheckItem]
+
+    @model_validator(mode="after")
+    def fill_user_id(self):
+        for item in self.checks:
+            if item.user_id is None:
+                if self.user_id is None:
+                    raise ValueError("user_id is required either on the request or on each check")
+                item.user_id = self.user_id
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "user_id": 2,
+                "checks": [
+                    {"module": "demo", "action": "demo.view"},
+                    {"module": "demo", "action": "demo.create"},
+                    {"user_id": 3, "module": "user", "action": "user.view"}
+                ]
+            }
+        }
+
+class CheckPermissionsResponse(BaseModel):
+    results: dict[int, dict[str, dict[str, bool]]]
+
+
 class RolePermissionOut(BaseModel):
     module_id: int
     permission_id: int
@@ -38,6 +103,7 @@ class RoleOut(BaseModel):
     id: int
     name: str
     description: Optional[str] = None
+    rank: int = 0
     permissions: List[RolePermissionOut] = []
 
     class Config:
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from functools import lru_cache
+from pydantic import BaseModel, create_model
 
 # Pydantic schemas for user operations
 class UserCreate(BaseModel):
@@ -27,6 +28,9 @@ class UserResponse(BaseModel):
     is_active: int
     role: str
     permissions: dict[str, list[str]] = {}
+    can_manage: bool | None = None
+    roles: list[str] = []
+    status: str | None = None  # "active" | "inactive"
     class Config:
         from_attributes = True
 
@@ -34,6 +38,36 @@ class UserResponse(BaseModel):
 from typing import List
 class PaginatedUserResponse(BaseModel):
     data: List[UserResponse]
-    total: int
-    page: int
+    total: int | None = None  # None khi include_total=false
+    page: int | None = None  # None khi phân trang bằng cursor
     page_size: int
+    next_cursor: str | None = None  # truyền vào `after` để lấy trang sau; None nếu hết
+
+# Sparse fieldset (?fields=id,username,status): model con chỉ gồm các field được chọn,
+# giữ nguyên kiểu/validate của UserResponse; cache theo tập field
+@lru_cache(maxsize=256)
+def partial_user_response(fields: frozenset) -> type[BaseModel]:
+    return create_model(
+        "UserResponsePartial",
+        **{name: (field.annotation, field) for name, field in UserResponse.model_fields.items() if name in fields},
+    )
+
+@lru_cache(maxsize=256)
+def partial_paginated_user_response(fields: frozenset) -> type[BaseModel]:
+    return create_model(
+        "PaginatedUserResponsePartial",
+        __base__=PaginatedUserResponse,
+        data=(List[partial_user_response(fields)], ...),
+    )
+
+# Báo cáo import user hàng loạt (lỗi theo từng dòng)
+class UserImportError(BaseModel):
+    line: int
+    username: str | None = None
+    error: str
+
+class UserImportResponse(BaseModel):
+    total: int
+    created: int
+    failed: int
+    errors: List[UserImportError] = []
@@ -0,0 +1,72 @@
+"""
+Chọn cost (rounds) cho scheme hash mật khẩu sao cho 1 lần verify trên máy hiện tại
+không vượt quá độ trễ mục tiêu. Kết quả dùng cho PASSWORD_HASH_ROUNDS của node này;
+hash cũ sẽ được hash lại dần khi user đăng nhập.
+
+Chạy từ thư mục backend:
+    python -m scripts.calibrate_password_hash --target-ms 250
+    python -m scripts.calibrate_password_hash --scheme pbkdf2_sha256 --target-ms 100
+"""
+import argparse
+import statistics
+import time
+
+from passlib.registry import get_crypt_handler
+
+from config.settings import settings
+
+SAMPLE_PASSWORD = "calibration-Password-123"
+
+
+def verify_ms(handler, rounds: int, samples: int) -> float:
+    hashed = handler.using(rounds=rounds).hash(SAMPLE_PASSWORD)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.verify(SAMPLE_PASSWORD, hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def candidate_rounds(handler):
+    """log2 cost (bcrypt): tăng từng bậc; cost tuyến tính (pbkdf2, argon2...): nhân đôi"""
+    if handler.rounds_cost == "log2":
+        yield from range(handler.min_rounds, handler.max_rounds + 1)
+        return
+    rounds = max(handler.min_rounds or 1, 1)
+    while handler.max_rounds is None or rounds <= handler.max_rounds:
+        yield rounds
+        rounds *= 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scheme", default=settings.PASSWORD_HASH_SCHEME)
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    handler = get_crypt_handler(args.scheme)
+    if "rounds" not in getattr(handler, "setting_kwds", ()):
+        parser.error(f"Scheme {args.scheme} has no tunable rounds")
+
+    chosen = None
+    print(f"{'rounds':>10}{'verify ms':>12}")
+    for rounds in candidate_rounds(handler):
+        elapsed = verify_ms(handler, rounds, args.samples)
+        print(f"{rounds:>10}{elapsed:>12.1f}")
+        if elapsed > args.target_ms:
+            break
+        chosen = rounds
+
+    if chosen is None:
+        print(f"Even the minimum cost exceeds {args.target_ms:.0f}ms on this machine")
+        return
+    print(f"\nPASSWORD_HASH_SCHEME={args.scheme}")
+    print(f"PASSWORD_HASH_ROUNDS={chosen}")
+    if args.scheme == settings.PASSWORD_HASH_SCHEME and chosen != settings.PASSWORD_HASH_ROUNDS:
+        print(f"(current PASSWORD_HASH_ROUNDS={settings.PASSWORD_HASH_ROUNDS}; existing hashes are upgraded on next login)")
+
+
+if __name__ == "__main__":
+    main()
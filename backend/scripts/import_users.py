@@ -0,0 +1,53 @@
+"""
+Import user hàng loạt từ file CSV (có header) hoặc NDJSON, cùng logic với POST /users/import.
+
+Chạy từ thư mục backend:
+    python -m scripts.import_users users.csv
+    python -m scripts.import_users users.ndjson --report report.json
+"""
+import argparse
+import json
+import os
+import time
+
+from database.database import SessionLocal
+from services.password_hashing import password_hasher
+from services.user_import import PARSERS, UserImportService, decode_lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(PARSERS), help="Mặc định suy ra từ phần mở rộng của file")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--report", help="Ghi báo cáo đầy đủ (JSON) ra file này")
+    args = parser.parse_args()
+
+    file_format = args.format or ("ndjson" if os.path.splitext(args.path)[1].lower() in (".ndjson", ".jsonl") else "csv")
+    options = {"allow_root": True}
+    if args.batch_size:
+        options["batch_size"] = args.batch_size
+
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        # Đọc nhị phân và giải mã từng dòng như endpoint: dòng không phải UTF-8 dừng import, vẫn có báo cáo
+        with open(args.path, "rb") as source:
+            report = UserImportService(db, **options).import_rows(PARSERS[file_format](decode_lines(source)))
+    finally:
+        db.close()
+        password_hasher.shutdown()
+    elapsed = time.perf_counter() - start
+
+    print(f"Processed {report['total']} rows in {elapsed:.1f}s: {report['created']} created, {report['failed']} failed")
+    for error in report["errors"][:20]:
+        print(f"  line {error['line']}: {error['username'] or '-'}: {error['error']}")
+    if len(report["errors"]) > 20:
+        print(f"  ... {len(report['errors']) - 20} more")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as target:
+            json.dump(report, target, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,32 @@
-from jose import jwt, JWTError
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from config.settings import settings
+from services.token_codec import TokenError, access_token_codec, refresh_token_codec
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def build_password_context(scheme: str, rounds: int) -> CryptContext:
+    """
+    Context dùng chung cho mọi chỗ hash/verify. Hash của scheme cũ hoặc khác cost hiện tại
+    vẫn verify được nhưng bị đánh dấu cần hash lại (needs_update / verify_and_update).
+    """
+    schemes = list(dict.fromkeys([scheme, "bcrypt"]))
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        **{
+            f"{scheme}__default_rounds": rounds,
+            # min = max = rounds: cả hash cost cao hơn lẫn thấp hơn đều được hash lại khi đăng nhập
+            f"{scheme}__min_rounds": rounds,
+            f"{scheme}__max_rounds": rounds,
+        },
+    )
+
+
+pwd_context = build_password_context(settings.PASSWORD_HASH_SCHEME, settings.PASSWORD_HASH_ROUNDS)
 
 
 def hash_password(password: str) -> str:
@@ -20,20 +41,73 @@ def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return access_token_codec.encode(to_encode)
 
 
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.JWT_REFRESH_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return refresh_token_codec.encode(to_encode)
 
 
 def verify_token(token: str, is_refresh: bool = False) -> dict:
     try:
-        secret = settings.JWT_REFRESH_SECRET_KEY if is_refresh else settings.JWT_SECRET_KEY
-        payload = jwt.decode(token, secret, algorithms=[settings.JWT_ALGORITHM])
+        codec = refresh_token_codec if is_refresh else access_token_codec
+        payload = codec.decode(token)
         return payload
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
\ No newline at end of file
+    except TokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+
+class VerifiedTokenCache:
+    """
+    Cache nhỏ (LRU) các access token đã verify chữ ký: token -> claims.
+    Token lặp lại trong thời hạn sống bỏ qua HMAC và parse JSON; entry tự hết hạn theo claim exp.
+    Token không hợp lệ không bao giờ được cache.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, token: str, claims: dict):
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._entries[token] = (exp, claims)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+verified_token_cache = VerifiedTokenCache(max_entries=settings.VERIFIED_TOKEN_CACHE_SIZE)
+
+
+def decode_access_token(token: str) -> dict:
+    """Verify access token, dùng lại kết quả đã verify nếu có. Raise TokenError nếu không hợp lệ; claims trả về là read-only"""
+    claims = verified_token_cache.get(token)
+    if claims is None:
+        claims = access_token_codec.decode(token)
+        verified_token_cache.set(token, claims)
+    return claims
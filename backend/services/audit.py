@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from config.settings import settings
+from database.database import SessionLocal
+from database.models.audit import AuthzAuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """
+    Ring buffer trong process cho các quyết định allow/deny.
+    Request chỉ append vào bộ nhớ; task nền gom theo lô và ghi bằng INSERT nhiều dòng.
+    Khi quá tải (buffer đầy) bản ghi cũ nhất bị bỏ để bộ nhớ luôn bị chặn trên.
+    """
+
+    def __init__(self, capacity: int = 10000, batch_size: int = 500):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self._events: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.batches = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+
+    def record(self, user_id, module: str, action: str, allowed: bool, source: str, method: str = None, path: str = None):
+        event = {
+            "created_at": datetime.now(timezone.utc),
+            "user_id": user_id,
+            "module": module,
+            "action": action,
+            "allowed": allowed,
+            "source": source,
+            "method": method,
+            "path": path[:255] if path else path,
+        }
+        with self._lock:
+            if len(self._events) >= self.capacity:
+                self._events.popleft()
+                self.dropped += 1
+            self._events.append(event)
+            self.recorded += 1
+
+    def _take_batch(self) -> list:
+        with self._lock:
+            count = min(self.batch_size, len(self._events))
+            return [self._events.popleft() for _ in range(count)]
+
+    def flush(self) -> int:
+        """Ghi hết buffer xuống DB theo lô; chạy trong thread (không chặn event loop)"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                start = time.perf_counter()
+                db = SessionLocal()
+                try:
+                    db.execute(insert(AuthzAuditLog).values(batch))
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    # Không đưa lại vào buffer để giữ bộ nhớ bị chặn; tính là bị bỏ
+                    with self._lock:
+                        self.flush_errors += 1
+                        self.dropped += len(batch)
+                    logger.exception("Failed to flush %d audit events", len(batch))
+                    break
+                finally:
+                    db.close()
+                written += len(batch)
+                with self._lock:
+                    self.flushed += len(batch)
+                    self.batches += 1
+                    self.last_flush_ms = (time.perf_counter() - start) * 1000
+        return written
+
+    async def run(self, interval: float):
+        """Task nền: flush định kỳ cho tới khi bị cancel, flush lần cuối khi tắt app"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                if self._events:
+                    await asyncio.to_thread(self.flush)
+        finally:
+            await asyncio.to_thread(self.flush)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._events),
+                "capacity": self.capacity,
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "flush_errors": self.flush_errors,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+            }
+
+
+audit_buffer = AuditBuffer(capacity=settings.AUDIT_BUFFER_SIZE, batch_size=settings.AUDIT_BATCH_SIZE)
+
+
+def record_decision(request, user_id, module: str, action: str, allowed: bool, source: str):
+    if not settings.AUDIT_ENABLED:
+        return
+    audit_buffer.record(
+        user_id, module, action, allowed, source,
+        method=request.method if request is not None else None,
+        path=request.url.path if request is not None else None,
+    )
@@ -1,11 +1,16 @@
+import time
+import uuid
 from datetime import timedelta, datetime, timezone
-from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from database.models.auth_models import User
 from config.settings import settings
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from security import pwd_context
+from fastapi.concurrency import run_in_threadpool
+from services.password_hashing import password_hasher
+from services.token_codec import TokenError, access_token_codec, refresh_token_codec
+from services.principal_cache import principal_cache
+from services.invalidation import publish_invalidation
+from services.token_revocation import RefreshFamilyService, TokenRevocationService, revocation_index
 
 
 class AuthService:
@@ -16,40 +21,146 @@ class AuthService:
         user = self.db.query(User).filter(User.username == username).first()
         if not user:
             raise ValueError("User not found")
-        if not pwd_context.verify(password, str(user.hashed_password)):
+        valid, new_hash = pwd_context.verify_and_update(password, str(user.hashed_password))
+        if not valid:
+            raise ValueError("Incorrect password")
+        if new_hash:
+            self._store_rehash(user.id, str(user.hashed_password), new_hash)
+        return user
+
+    def _store_rehash(self, user_id: int, old_hash: str, new_hash: str):
+        """
+        Lưu hash theo chính sách hiện tại (scheme/cost) sau khi đăng nhập đúng mật khẩu.
+        Không phải đổi mật khẩu nên không thu hồi token; chỉ ghi nếu hash chưa bị đổi song song.
+        """
+        self.db.query(User).filter(User.id == user_id, User.hashed_password == old_hash).update(
+            {"hashed_password": new_hash, "version": User.version + 1}, synchronize_session=False
+        )
+        self.db.commit()
+
+    def _get_user_by_username(self, username: str) -> User:
+        user = self.db.query(User).filter(User.username == username).first()
+        if not user:
+            raise ValueError("User not found")
+        return user
+
+    def _get_password_hash(self, user_id: int) -> str:
+        hashed_password = self.db.query(User.hashed_password).filter(User.id == user_id).scalar()
+        if hashed_password is None:
+            raise ValueError("User not found")
+        return hashed_password
+
+    def _update_password_hash(self, user_id: int, hashed_password: str):
+        """Ghi hash mới và vô hiệu principal đã cache của user (mọi worker)"""
+        self.db.query(User).filter(User.id == user_id).update({"hashed_password": hashed_password, "version": User.version + 1})
+        publish_invalidation(self.db, "user", user_id=user_id)
+        self.db.commit()
+        principal_cache.invalidate(user_id)
+        # Đổi mật khẩu -> mọi refresh token (mọi family) phát hành trước đó hết hiệu lực
+        TokenRevocationService(self.db).revoke_user_tokens(user_id)
+
+    async def authenticate_user_async(self, username: str, password: str) -> User:
+        """Như authenticate_user nhưng bcrypt chạy trong process pool, không chặn event loop"""
+        user = await run_in_threadpool(self._get_user_by_username, username)
+        old_hash = str(user.hashed_password)
+        valid, new_hash = await password_hasher.verify_and_update(password, old_hash)
+        if not valid:
             raise ValueError("Incorrect password")
+        if new_hash:
+            await run_in_threadpool(self._store_rehash, user.id, old_hash, new_hash)
         return user
 
     def create_access_token(self, user: User, expires_delta: timedelta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)) -> str:
         to_encode = {"sub": str(user.id), "role": user.role}
+        if settings.JWT_PERMISSION_SNAPSHOT:
+            # Đóng gói quyền vào token để các request sau không cần hỏi DB khi phân quyền
+            from services.permission_snapshot import build_snapshot_claims
+            to_encode.update(build_snapshot_claims(self.db, user.id))
         expire = datetime.now(timezone.utc) + expires_delta
         to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+        encoded_jwt = access_token_codec.encode(to_encode)
         return encoded_jwt
 
-    def create_refresh_token(self, user: User, expires_delta: timedelta = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)) -> str:
-        to_encode = {"sub": str(user.id), "role": user.role}
+    def create_refresh_token(self, user: User, expires_delta: timedelta = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES), family: str | None = None, jti: str | None = None) -> str:
+        """
+        Refresh token dùng 1 lần: jti riêng cho mỗi token, fam giữ nguyên qua các lần xoay vòng.
+        Không truyền family (đăng nhập) -> family mới, được ghi vào refresh_families cùng jti này.
+        iat lấy tới mili giây để so với mốc thu hồi theo user.
+        """
+        jti = jti or uuid.uuid4().hex
         expire = datetime.now(timezone.utc) + expires_delta
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, settings.JWT_REFRESH_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+        if family is None:
+            family = uuid.uuid4().hex
+            RefreshFamilyService(self.db).start(family, jti, user.id, expire)
+        to_encode = {
+            "sub": str(user.id),
+            "role": user.role,
+            "jti": jti,
+            "fam": family,
+            "iat": round(time.time(), 3),
+            "exp": expire,
+        }
+        encoded_jwt = refresh_token_codec.encode(to_encode)
         return encoded_jwt
 
-    def change_password(self, user: User, current_password: str, new_password: str) -> bool:
-        """Đổi mật khẩu cho user hiện tại"""
+    def _decode_refresh_token(self, refresh_token: str) -> dict:
+        try:
+            claims = refresh_token_codec.decode(refresh_token)
+        except TokenError:
+            raise ValueError("Invalid token")
+        if claims.get("sub") is None or not claims.get("jti") or not claims.get("fam"):
+            raise ValueError("Invalid token payload")
+        return claims
+
+    def rotate_refresh_token(self, refresh_token: str) -> tuple[str, str]:
+        """
+        Đổi refresh token lấy cặp token mới cùng family.
+        Thu hồi được kiểm tra bằng chỉ mục trong bộ nhớ; jti hiện tại của family được thay bằng
+        compare-and-set. jti không phải jti hiện tại (token đã dùng bị dùng lại, vd. bị đánh cắp)
+        -> thu hồi cả family.
+        """
+        claims = self._decode_refresh_token(refresh_token)
+        if revocation_index.is_family_revoked(claims):
+            raise ValueError("Token has been revoked")
+        user_id = int(claims["sub"])
+        new_jti = uuid.uuid4().hex
+        expires_delta = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+        if not RefreshFamilyService(self.db).rotate(claims["fam"], claims["jti"], new_jti, datetime.now(timezone.utc) + expires_delta):
+            TokenRevocationService(self.db).revoke_family(claims["fam"], user_id)
+            raise ValueError("Token has been revoked")
+        user = principal_cache.load(self.db, user_id)
+        if user is None:
+            raise ValueError("User not found")
+        return self.create_access_token(user), self.create_refresh_token(user, expires_delta, family=claims["fam"], jti=new_jti)
+
+    def revoke_refresh_token_family(self, refresh_token: str):
+        """Đăng xuất: thu hồi cả family của refresh token"""
+        claims = self._decode_refresh_token(refresh_token)
+        TokenRevocationService(self.db).revoke_family(claims["fam"], int(claims["sub"]))
+
+    def change_password(self, user, current_password: str, new_password: str) -> bool:
+        """Đổi mật khẩu cho user hiện tại (user có thể là Principal đã cache nên đọc hash từ DB)"""
         # Verify current password
-        if not pwd_context.verify(current_password, str(user.hashed_password)):
+        if not pwd_context.verify(current_password, self._get_password_hash(user.id)):
             raise ValueError("Current password is incorrect")
 
         # Hash new password
         hashed_new_password = pwd_context.hash(new_password)
         
         # Update password in database
-        self.db.query(User).filter(User.id == user.id).update({"hashed_password": hashed_new_password})
-        self.db.commit()
-        self.db.refresh(user)
+        self._update_password_hash(user.id, hashed_new_password)
         return True
     
     
+    async def change_password_async(self, user, current_password: str, new_password: str) -> bool:
+        """Đổi mật khẩu, bcrypt chạy trong process pool"""
+        hashed_password = await run_in_threadpool(self._get_password_hash, user.id)
+        if not await password_hasher.verify(current_password, hashed_password):
+            raise ValueError("Current password is incorrect")
+        hashed_new_password = await password_hasher.hash(new_password)
+        await run_in_threadpool(self._update_password_hash, user.id, hashed_new_password)
+        return True
+
     def create_reset_token(self, user: User) -> str:
         """Tạo token để reset password (có thời hạn ngắn)"""
         to_encode = {
@@ -57,14 +168,14 @@ class AuthService:
             "type": "password_reset",
             "exp": datetime.now(timezone.utc) + timedelta(minutes=15)  # Token có hiệu lực 15 phút
         }
-        encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+        encoded_jwt = access_token_codec.encode(to_encode)
         return encoded_jwt
     
 
     def verify_reset_token(self, token: str) -> User:
         """Verify reset password token và trả về user"""
         try:
-            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+            payload = access_token_codec.decode(token)
             user_id = payload.get("sub")
             token_type = payload.get("type")
             
@@ -76,7 +187,7 @@ class AuthService:
                 raise ValueError("User not found")
                 
             return user
-        except JWTError:
+        except TokenError:
             raise ValueError("Invalid or expired reset token")
     
     
@@ -88,8 +199,7 @@ class AuthService:
         hashed_new_password = pwd_context.hash(new_password)
         
         # Update password in database
-        self.db.query(User).filter(User.id == user.id).update({"hashed_password": hashed_new_password})
-        self.db.commit()
+        self._update_password_hash(user.id, hashed_new_password)
         self.db.refresh(user)
         
         return True
@@ -113,8 +223,15 @@ class AuthService:
         hashed_new_password = pwd_context.hash(new_password)
         
         # Update password in database
-        self.db.query(User).filter(User.id == user.id).update({"hashed_password": hashed_new_password})
-        self.db.commit()
+        self._update_password_hash(user.id, hashed_new_password)
         self.db.refresh(user)
         
-        return True
\ No newline at end of file
+        return True
+
+
+    async def simple_reset_password_async(self, username: str, new_password: str) -> bool:
+        """Reset password đơn giản, bcrypt chạy trong process pool"""
+        user = await run_in_threadpool(self._get_user_by_username, username)
+        hashed_new_password = await password_hasher.hash(new_password)
+        await run_in_threadpool(self._update_password_hash, user.id, hashed_new_password)
+        return True
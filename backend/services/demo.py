@@ -1,32 +1,53 @@
 from sqlalchemy.orm import Session
 from database.models.demos import Demo
 from schemas.demos import DemoCreate, DemoUpdate
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from services.invalidation import publish_invalidation
+from services.list_totals import fetch_page_and_total, list_total_cache
+from services.pagination import apply_keyset, parse_sort
+from services.search import contains_any
+
+# Các cột được phép sắp xếp (mỗi cột có index tổng hợp (cột, id))
+DEMO_SORT_COLUMNS = {"id": Demo.id, "created_at": Demo.created_at, "title": Demo.title}
 
 
 class DemoService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all_demos(self, skip: int = 0, limit: int = 100, search: Optional[str] = None) -> List[Demo]:
-        """Lấy tất cả demos với phân trang và tìm kiếm"""
+    def _search_query(self, search: Optional[str] = None):
         query = self.db.query(Demo)
         if search:
-            like = f"%{search}%"
-            query = query.filter(
-                (Demo.title.ilike(like)) | (Demo.description.ilike(like))
-            )
-        return query.order_by(Demo.id.asc()).offset(skip).limit(limit).all()
+            query = query.filter(contains_any(self.db, (Demo.title, Demo.description), search))
+        return query
+
+    def get_all_demos(
+        self, skip: int = 0, limit: int = 100, search: Optional[str] = None,
+        sort: str = "id", after: Optional[dict] = None,
+    ) -> List[Demo]:
+        """Lấy tất cả demos với phân trang (offset hoặc cursor `after`) và tìm kiếm"""
+        column, descending = parse_sort(sort, DEMO_SORT_COLUMNS)
+        query = apply_keyset(self._search_query(search), column, Demo.id, descending, after)
+        if after is None:
+            query = query.offset(skip)
+        return query.limit(limit).all()
+
+    def get_demos_with_total(
+        self, skip: int = 0, limit: int = 100, search: Optional[str] = None,
+        sort: str = "id", after: Optional[dict] = None, count: str = "exact",
+    ) -> Tuple[List[Demo], Optional[int]]:
+        """Như get_all_demos, kèm tổng số demos khớp tìm kiếm trong cùng câu SQL khi có thể"""
+        column, descending = parse_sort(sort, DEMO_SORT_COLUMNS)
+        base_query = self._search_query(search)
+        page_query = apply_keyset(base_query, column, Demo.id, descending, after)
+        return fetch_page_and_total(
+            self.db, Demo, base_query, page_query,
+            search=search, offset=None if after else skip, limit=limit, count=count,
+        )
 
     def count_demos(self, search: Optional[str] = None) -> int:
         """Đếm tổng số lượng demos (có tìm kiếm)"""
-        query = self.db.query(Demo)
-        if search:
-            like = f"%{search}%"
-            query = query.filter(
-                (Demo.title.ilike(like)) | (Demo.description.ilike(like))
-            )
-        return query.count()
+        return self._search_query(search).count()
 
     def get_demo_by_id(self, demo_id: int) -> Optional[Demo]:
         """Lấy demo theo ID"""
@@ -39,7 +60,9 @@ class DemoService:
             description=demo_data.description
         )
         self.db.add(new_demo)
+        publish_invalidation(self.db, "list_totals", table="demos")
         self.db.commit()
+        list_total_cache.invalidate("demos")
         self.db.refresh(new_demo)
         return new_demo
 
@@ -54,8 +77,11 @@ class DemoService:
         if demo_data.description is not None:
             update_dict["description"] = demo_data.description
         if update_dict:
+            update_dict["version"] = Demo.version + 1
             self.db.query(Demo).filter(Demo.id == demo_id).update(update_dict)
+            publish_invalidation(self.db, "list_totals", table="demos")
             self.db.commit()
+            list_total_cache.invalidate("demos")
             self.db.refresh(demo)
         return demo
 
@@ -66,6 +92,8 @@ class DemoService:
             return False
         
         self.db.delete(demo)
+        publish_invalidation(self.db, "list_totals", table="demos")
         self.db.commit()
+        list_total_cache.invalidate("demos")
         return True
 
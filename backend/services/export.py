@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from config.settings import settings
+from database.database import SessionLocal
+from database.models.auth_models import User
+from database.models.demos import Demo
+from services.rbac import RBACService
+from services.search import contains_any
+
+USER_EXPORT_COLUMNS = ("id", "username", "email", "full_name", "phone", "is_active", "role", "roles", "created_at")
+DEMO_EXPORT_COLUMNS = ("id", "title", "description", "created_at", "updated_at")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _stream(db: Session, stmt, chunk_size: int):
+    """
+    Đọc kết quả theo từng chunk bằng server-side cursor (yield_per bật stream_results trên Postgres):
+    chỉ 1 chunk nằm trong bộ nhớ, chọn cột thay vì entity nên identity map không phình ra.
+    """
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for chunk in result.partitions():
+        yield [row._asdict() for row in chunk]
+
+
+def user_export_chunks(db: Session, search: str = "", chunk_size: int = settings.EXPORT_CHUNK_SIZE):
+    """Các chunk dict user (không có hashed_password); roles resolve bằng 1 query mỗi chunk"""
+    stmt = select(*(getattr(User, column) for column in USER_EXPORT_COLUMNS if column != "roles")).order_by(User.id)
+    if search:
+        stmt = stmt.where(contains_any(db, (User.username, User.email), search))
+    role_service = RBACService(db)
+    for chunk in _stream(db, stmt, chunk_size):
+        roles = role_service.get_role_names_for_users([row["id"] for row in chunk])
+        for row in chunk:
+            row["roles"] = roles[row["id"]]
+        yield chunk
+
+
+def demo_export_chunks(db: Session, search: str = "", chunk_size: int = settings.EXPORT_CHUNK_SIZE):
+    stmt = select(*(getattr(Demo, column) for column in DEMO_EXPORT_COLUMNS)).order_by(Demo.id)
+    if search:
+        stmt = stmt.where(contains_any(db, (Demo.title, Demo.description), search))
+    yield from _stream(db, stmt, chunk_size)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _ndjson(chunks, columns):
+    for chunk in chunks:
+        yield "".join(json.dumps(row, default=_json_default, ensure_ascii=False) + "\n" for row in chunk).encode("utf-8")
+
+
+def _csv(chunks, columns):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for chunk in chunks:
+        for row in chunk:
+            if isinstance(row.get("roles"), list):
+                row["roles"] = "|".join(row["roles"])
+            writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_export(load_chunks, format: str, columns, **kwargs):
+    """
+    Body cho StreamingResponse: mỗi chunk DB thành 1 khối bytes NDJSON/CSV.
+    Dùng session riêng vì session của request (get_db) đã đóng trước khi body được gửi;
+    session được đóng cả khi client ngắt kết nối giữa chừng.
+    """
+    db = SessionLocal()
+    try:
+        encode = _ndjson if format == "ndjson" else _csv
+        yield from encode(load_chunks(db, **kwargs), columns)
+    finally:
+        db.close()
@@ -0,0 +1,124 @@
+import json
+import logging
+import select
+import threading
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from config.settings import settings
+from services.list_totals import list_total_cache
+from services.permission_cache import permission_cache
+from services.principal_cache import principal_cache
+from services.rbac_registry import rbac_registry
+from services.rbac_version import apply_rbac_message
+
+logger = logging.getLogger(__name__)
+
+# kind -> [handler(message)]; các cache trong process đăng ký hàm xoá/vô hiệu của mình ở đây
+_handlers: dict = {}
+
+
+def register_handler(kind: str, handler):
+    _handlers.setdefault(kind, []).append(handler)
+
+
+def publish_invalidation(db: Session, kind: str, **data):
+    """
+    Gửi NOTIFY cho các worker khác. Gọi TRƯỚC db.commit() trong cùng transaction:
+    Postgres chỉ phát NOTIFY khi transaction commit (và bỏ nếu rollback),
+    nên các worker nhận được đúng sau khi thay đổi đã được commit.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    payload = json.dumps({"origin": permission_cache.epoch, "kind": kind, **data})
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": settings.RBAC_INVALIDATION_CHANNEL, "payload": payload})
+
+
+def apply_invalidation(message: dict):
+    # Chính process này đã tự vô hiệu cache khi commit
+    if message.get("origin") == permission_cache.epoch:
+        return
+    for handler in _handlers.get(message.get("kind"), []):
+        try:
+            handler(message)
+        except Exception:
+            logger.exception("Invalidation handler failed for %s", message)
+
+
+register_handler("rbac", apply_rbac_message)
+register_handler("registry", lambda message: rbac_registry.invalidate())
+register_handler("user", lambda message: principal_cache.invalidate(message.get("user_id")))
+register_handler("list_totals", lambda message: list_total_cache.invalidate(message.get("table")))
+
+
+class InvalidationListener:
+    """
+    Thread nền LISTEN trên kênh invalidation bằng 1 kết nối psycopg2 riêng (autocommit),
+    nhận NOTIFY từ các worker khác và gọi handler tương ứng. Tự kết nối lại khi mất kết nối.
+    """
+
+    def __init__(self, engine, channel: str = None, poll_timeout: float = 1.0, reconnect_delay: float = 2.0):
+        self.engine = engine
+        self.channel = channel or settings.RBAC_INVALIDATION_CHANNEL
+        self.poll_timeout = poll_timeout
+        self.reconnect_delay = reconnect_delay
+        self.received = 0
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def _connect(self):
+        # Tách 1 kết nối khỏi pool để giữ LISTEN suốt vòng đời listener
+        proxied = self.engine.raw_connection()
+        proxied.detach()
+        conn = proxied.driver_connection
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _listen(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                self._ready.set()
+                # Có thể đã lỡ NOTIFY trong lúc mất kết nối -> vô hiệu toàn bộ cho chắc
+                apply_invalidation({"kind": "rbac"})
+                apply_invalidation({"kind": "registry"})
+                apply_invalidation({"kind": "user"})
+                apply_invalidation({"kind": "list_totals"})
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.received += 1
+                        try:
+                            message = json.loads(notify.payload)
+                        except ValueError:
+                            logger.warning("Ignoring malformed invalidation payload: %r", notify.payload)
+                            continue
+                        apply_invalidation(message)
+            except Exception:
+                self._ready.clear()
+                logger.exception("Invalidation listener lost its connection, reconnecting")
+                self._stop.wait(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, name="rbac-invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: float = 5.0) -> bool:
+        return self._ready.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+from config.settings import settings
+
+
+class ListTotalCache:
+    """
+    Cache tổng số dòng của danh sách theo (bảng, từ khoá tìm kiếm), có TTL và giới hạn entry (LRU).
+    Bị xoá theo bảng khi có ghi (kể cả từ worker khác qua NOTIFY "list_totals");
+    TTL chặn độ lệch còn lại (vd. ghi trực tiếp vào DB).
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 30):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Tăng mỗi lần invalidate: tổng đếm trước đó không được ghi đè lên cache
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, table: str, search: str):
+        key = (table, search)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, table: str, search: str, total: int, generation: int):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[(table, search)] = (time.monotonic() + self.ttl_seconds, total)
+            self._entries.move_to_end((table, search))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table: str | None = None):
+        """Xoá mọi tổng của 1 bảng (hoặc tất cả); gọi sau khi commit"""
+        with self._lock:
+            self.generation += 1
+            if table is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == table]:
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+list_total_cache = ListTotalCache(
+    max_entries=settings.LIST_TOTAL_CACHE_SIZE,
+    ttl_seconds=settings.LIST_TOTAL_CACHE_TTL_SECONDS,
+)
+
+
+def estimate_row_count(db: Session, model) -> int:
+    """
+    Số dòng ước lượng của cả bảng: pg_class.reltuples (cập nhật bởi ANALYZE/autovacuum), không quét bảng.
+    Bảng chưa từng được ANALYZE (reltuples < 0) hoặc SQLite: đếm chính xác.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": model.__tablename__},
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+    return db.execute(select(func.count()).select_from(model)).scalar()
+
+
+def fetch_page_and_total(db: Session, model, base_query, page_query, *, search: str, offset: int | None, limit: int, count: str):
+    """
+    Trả về (rows, total) cho 1 trang danh sách.
+    base_query: đã lọc tìm kiếm (dùng để đếm); page_query: base_query đã sắp xếp/keyset, chưa offset/limit.
+    offset=None nghĩa là phân trang bằng cursor. count: exact | approximate | none.
+    exact: lấy tổng từ cache, nếu không có thì kèm count(*) OVER () vào chính câu lấy trang (1 câu SQL).
+    approximate: chỉ áp dụng khi không tìm kiếm, dùng estimate_row_count; có tìm kiếm thì như exact.
+    """
+    search = search or ""
+    if offset is not None:
+        page_query = page_query.offset(offset)
+    page_query = page_query.limit(limit)
+    if count == "none":
+        return page_query.all(), None
+    if count == "approximate" and not search:
+        return page_query.all(), estimate_row_count(db, model)
+
+    table = model.__tablename__
+    total = list_total_cache.get(table, search)
+    if total is not None:
+        return page_query.all(), total
+    generation = list_total_cache.generation
+    if offset is not None:
+        # Window count được tính trên toàn bộ tập đã lọc, trước LIMIT/OFFSET
+        rows = page_query.add_columns(func.count().over().label("total_count")).all()
+        if rows or offset == 0:
+            total = rows[0].total_count if rows else 0
+            list_total_cache.set(table, search, total, generation)
+            return [row[0] for row in rows], total
+    # Trang cursor (điều kiện keyset làm sai window count) hoặc trang vượt quá cuối: đếm riêng
+    rows = page_query.all()
+    total = base_query.order_by(None).count()
+    list_total_cache.set(table, search, total, generation)
+    return rows, total
@@ -0,0 +1,90 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, func, tuple_
+
+
+def encode_cursor(sort: str, value, row_id: int) -> str:
+    """Cursor mờ (base64url của JSON) trỏ tới dòng cuối của trang hiện tại"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({"s": sort, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> dict:
+    """Giải mã cursor; ValueError nếu cursor hỏng hoặc được tạo cho kiểu sắp xếp khác"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, dict) or not isinstance(payload.get("id"), int):
+            raise ValueError
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort:
+        raise ValueError("Cursor does not match sort order")
+    return payload
+
+
+def parse_sort(sort: str, columns: dict) -> tuple:
+    """'created_at' / '-created_at' -> (cột, giảm dần?); ValueError nếu không hỗ trợ"""
+    descending = sort.startswith("-")
+    column = columns.get(sort.lstrip("-"))
+    if column is None:
+        raise ValueError(f"Unsupported sort '{sort}', expected one of: {', '.join(columns)}")
+    return column, descending
+
+
+def _sort_expression(query, column, value=None):
+    """
+    SQLite lưu datetime dạng chuỗi (CURRENT_TIMESTAMP không có phần lẻ giây, bind param thì có)
+    nên so sánh chuỗi sai; dùng julianday() cho SQLite. Postgres so sánh trực tiếp trên index.
+    """
+    if isinstance(column.type, DateTime) and query.session.get_bind().dialect.name == "sqlite":
+        return func.julianday(column), (None if value is None else func.julianday(value))
+    return column, value
+
+
+def apply_keyset(query, column, id_column, descending: bool, cursor: dict | None = None):
+    """
+    Sắp xếp ổn định theo (column, id) và chỉ lấy các dòng sau cursor.
+    Điều kiện dạng row value (column, id) > (v, id) khớp với index tổng hợp (column, id),
+    nên trang thứ N tốn chi phí như trang đầu.
+    """
+    if column is id_column:
+        if cursor is not None:
+            query = query.filter(id_column < cursor["id"] if descending else id_column > cursor["id"])
+        return query.order_by(id_column.desc() if descending else id_column.asc())
+
+    value = cursor["v"] if cursor is not None else None
+    if value is not None and isinstance(column.type, DateTime):
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+    sort_expr, value_expr = _sort_expression(query, column, value)
+    if cursor is not None:
+        key, bound = tuple_(sort_expr, id_column), tuple_(value_expr, cursor["id"])
+        query = query.filter(key < bound if descending else key > bound)
+    if descending:
+        return query.order_by(sort_expr.desc(), id_column.desc())
+    return query.order_by(sort_expr.asc(), id_column.asc())
+
+
+def next_page(rows: list, limit: int, sort: str, sort_attr: str) -> tuple:
+    """
+    rows được query với limit + 1: dòng thừa cho biết còn trang sau.
+    Trả về (rows của trang, next_cursor hoặc None).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, getattr(last, sort_attr), last.id)
+
+
+def count_mode(include_total: bool, approximate_total: bool) -> str:
+    """Query params của route -> chế độ count của fetch_page_and_total"""
+    if not include_total:
+        return "none"
+    return "approximate" if approximate_total else "exact"
@@ -0,0 +1,168 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from fastapi import HTTPException, status
+from config.settings import settings
+
+
+# Hàm chạy trong process con: phải ở cấp module để pickle được
+def _hash_password(password: str) -> str:
+    from security import pwd_context
+    return pwd_context.hash(password)
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    from security import pwd_context
+    return pwd_context.verify(password, hashed_password)
+
+
+def _verify_and_update(password: str, hashed_password: str):
+    from security import pwd_context
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Process pool riêng cho bcrypt (~250ms CPU mỗi lần): không giữ GIL và slot threadpool của anyio.
+    Hàng đợi bị chặn: khi số việc đang chờ + đang chạy vượt giới hạn thì từ chối ngay bằng 503.
+    """
+
+    def __init__(self, max_workers: int = 0, max_queue: int = 64, bulk_workers: int = 0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        # Import chỉ chiếm tối đa bấy nhiêu slot cùng lúc, phần còn lại của pool luôn dành cho login
+        self.bulk_workers = min(bulk_workers or max(1, self.max_workers // 2), self.max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.bulk_hashed = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: không fork kèm các thread nền (audit, LISTEN) của process chính
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _release(self, latency_ms: float, ok: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.completed += 1
+                self.total_latency_ms += latency_ms
+                self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            else:
+                self.failed += 1
+
+    async def _submit(self, fn, *args):
+        self._acquire()
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+            ok = True
+            return result
+        finally:
+            self._release((time.perf_counter() - start) * 1000, ok)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(_verify_password, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str):
+        """(hợp lệ, hash mới | None): hash mới khi hash cũ không khớp scheme/cost hiện tại"""
+        return await self._submit(_verify_and_update, password, hashed_password)
+
+    def hash_many(self, passwords: list) -> list:
+        """
+        Hash cả lô (import hàng loạt, chạy trong thread/CLI) với tối đa bulk_workers việc trên pool cùng lúc.
+        Pool xử lý FIFO: nộp cả lô một lần sẽ xếp hàng trước mọi lần verify của login đến sau.
+        Không bị từ chối bởi giới hạn hàng đợi (tác vụ quản trị, tự chờ), nhưng vẫn tính vào in_flight.
+        """
+        executor = self._get_executor()
+        hashes = [None] * len(passwords)
+        pending = {}
+        remaining = iter(enumerate(passwords))
+        try:
+            while True:
+                for index, password in remaining:
+                    with self._lock:
+                        self.in_flight += 1
+                        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                    pending[executor.submit(_hash_password, password)] = index
+                    if len(pending) >= self.bulk_workers:
+                        break
+                if not pending:
+                    return hashes
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    with self._lock:
+                        self.in_flight -= 1
+                        self.bulk_hashed += 1
+                    hashes[index] = future.result()
+        finally:
+            # Lỗi giữa chừng: huỷ phần chưa chạy, trả lại slot
+            for future in pending:
+                future.cancel()
+            with self._lock:
+                self.in_flight -= len(pending)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "capacity": self.capacity,
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "bulk_hashed": self.bulk_hashed,
+                "avg_latency_ms": round(self.total_latency_ms / self.completed, 3) if self.completed else 0.0,
+                "max_latency_ms": round(self.max_latency_ms, 3),
+            }
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE_SIZE,
+    bulk_workers=settings.PASSWORD_HASH_BULK_WORKERS,
+)
@@ -0,0 +1,79 @@
+import threading
+import uuid
+from collections import OrderedDict
+from config.settings import settings
+
+
+class PermissionCache:
+    """
+    Cache trong process: user_id -> quyền đã biên dịch {module: (action, ...)}.
+    Mỗi entry được gắn version RBAC dùng chung (bảng rbac_version); mọi thay đổi RBAC tăng version
+    trong DB rồi gọi set_version() nên entry cũ tự hết hiệu lực mà không cần quét lại cache.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # epoch phân biệt các process (origin của NOTIFY)
+        self.epoch = uuid.uuid4().hex[:8]
+        # Bản sao version/changed_at của dòng rbac_version, giống nhau giữa các worker
+        self.version = 0
+        self.changed_at = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            version, value = entry
+            if version != self.version:
+                # Entry cũ hơn version hiện tại -> bỏ luôn
+                del self._entries[user_id]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return value
+
+    def set(self, user_id: int, value, version: int):
+        """Lưu value đã load ở `version`; bỏ qua nếu RBAC vừa thay đổi trong lúc query"""
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[user_id] = (version, value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_version(self, version: int, changed_at=None):
+        """Gọi sau khi commit thay đổi RBAC hoặc khi nhận version mới từ worker khác; version chỉ tăng"""
+        with self._lock:
+            if version > self.version:
+                self.version = version
+                self.changed_at = changed_at
+
+    def stamp(self, version: int | None = None) -> str:
+        """Version dạng chuỗi, dùng để đóng dấu dữ liệu phát sinh từ RBAC (token, ETag); có nghĩa ở mọi worker"""
+        return str(self.version if version is None else version)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "epoch": self.epoch,
+                "version": self.version,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+permission_cache = PermissionCache(max_entries=settings.PERMISSION_CACHE_SIZE)
@@ -0,0 +1,57 @@
+from sqlalchemy.orm import Session
+from services.permission_cache import permission_cache
+from services.rbac import RBACService
+from services.rbac_registry import rbac_registry
+
+# Claim trong access token:
+#   "rv": version RBAC dùng chung (bảng rbac_version) lúc phát hành -> token hợp lệ ở mọi worker
+#   "pm": "<module_id>:<hex bitset theo permission_id>,..." vd "1:1e,2:1e0"
+# id của module/permission không bao giờ đổi nên bitset ổn định giữa các lần phát hành.
+SNAPSHOT_VERSION_CLAIM = "rv"
+SNAPSHOT_PERMISSIONS_CLAIM = "pm"
+
+
+def encode_permission_ids(pairs) -> str:
+    masks = {}
+    for module_id, permission_id in pairs:
+        masks[module_id] = masks.get(module_id, 0) | (1 << permission_id)
+    return ",".join(f"{module_id}:{mask:x}" for module_id, mask in sorted(masks.items()))
+
+
+def decode_permission_ids(encoded: str) -> dict:
+    """Trả về {module_id: bitmask}"""
+    masks = {}
+    if not encoded:
+        return masks
+    for part in encoded.split(","):
+        module_id, mask = part.split(":", 1)
+        masks[int(module_id)] = int(mask, 16)
+    return masks
+
+
+def build_snapshot_claims(db: Session, user_id: int) -> dict:
+    """Claims chứa snapshot quyền của user, đóng dấu version RBAC hiện tại"""
+    # Lấy version trước khi query: nếu RBAC đổi giữa chừng thì token bị coi là cũ
+    version = permission_cache.version
+    pairs = RBACService(db)._load_user_permission_ids(user_id)
+    return {
+        SNAPSHOT_VERSION_CLAIM: permission_cache.stamp(version),
+        SNAPSHOT_PERMISSIONS_CLAIM: encode_permission_ids(pairs),
+    }
+
+
+def check_snapshot(claims: dict, db: Session, module_name: str, permission_name: str):
+    """
+    Kiểm tra quyền từ snapshot trong token.
+    Trả về None nếu token không có snapshot hoặc snapshot đã cũ -> caller phải hỏi DB.
+    """
+    stamp = claims.get(SNAPSHOT_VERSION_CLAIM)
+    encoded = claims.get(SNAPSHOT_PERMISSIONS_CLAIM)
+    if stamp is None or encoded is None or stamp != permission_cache.stamp():
+        return None
+    module = rbac_registry.get_module(db, module_name)
+    permission = rbac_registry.get_permission(db, permission_name)
+    if module is None or permission is None:
+        return False
+    mask = decode_permission_ids(encoded).get(module.id, 0)
+    return bool(mask >> permission.id & 1)
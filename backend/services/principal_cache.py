@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from config.settings import settings
+from database.models.auth_models import User
+
+
+class Principal:
+    """
+    Snapshot bất biến của user đã xác thực (chỉ các field route cần đọc).
+    Không chứa hashed_password: các thao tác cần mật khẩu tự đọc lại từ DB.
+    """
+
+    __slots__ = ("id", "username", "email", "full_name", "phone", "is_active", "role")
+
+    def __init__(self, id: int, username: str, email: str, full_name, phone, is_active: int, role: str):
+        for name, value in zip(self.__slots__, (id, username, email, full_name, phone, is_active, role)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Principal is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Principal is immutable")
+
+    def __repr__(self):
+        return f"Principal(id={self.id}, username={self.username!r})"
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(user.id, user.username, user.email, user.full_name, user.phone, user.is_active, user.role)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class PrincipalCache:
+    """
+    Cache trong process: user_id -> Principal, có TTL và giới hạn số entry (LRU).
+    Bị vô hiệu khi update/delete user hoặc đổi mật khẩu (kể cả từ worker khác qua NOTIFY "user").
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Tăng mỗi lần invalidate: entry load trước đó không được ghi đè lên cache
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return principal
+
+    def set(self, user_id: int, principal: Principal, generation: int):
+        """Lưu principal đã load ở `generation`; bỏ qua nếu có invalidate trong lúc query"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def load(self, db: Session, user_id: int):
+        """Principal của user từ cache, hoặc query 1 lần rồi cache; None nếu user không tồn tại"""
+        principal = self.get(user_id)
+        if principal is None:
+            generation = self.generation
+            row = db.query(User).filter(User.id == user_id).first()
+            if row is None:
+                return None
+            principal = Principal.from_user(row)
+            self.set(user_id, principal, generation)
+        return principal
+
+    def invalidate(self, user_id: int | None = None):
+        """Xoá 1 user (hoặc toàn bộ nếu user_id=None); gọi sau khi commit"""
+        with self._lock:
+            self.generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,143 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from config.settings import settings
+from database.models.rate_limit import RateLimitBucket
+
+
+class LocalGCRABackend:
+    """
+    Lưu TAT (theoretical arrival time) của GCRA trong bộ nhớ process, giới hạn số key (LRU).
+    Dùng khi chạy 1 worker hoặc trong test; không chia sẻ giữa các worker.
+    """
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tats: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, now: float, interval: float, tolerance: float) -> float:
+        """Trả về 0 nếu cho qua (và ghi nhận), ngược lại số giây phải chờ"""
+        with self._lock:
+            tat = max(self._tats.get(key, now), now)
+            new_tat = tat + interval
+            wait = new_tat - now - tolerance
+            if wait > 0:
+                return wait
+            self._tats[key] = new_tat
+            self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                # Key cũ nhất gần như chắc chắn đã hồi đầy bucket (tat <= now)
+                self._tats.popitem(last=False)
+            return 0.0
+
+    def reset(self):
+        with self._lock:
+            self._tats.clear()
+
+
+class DatabaseGCRABackend:
+    """
+    TAT lưu ở bảng rate_limit_buckets để giới hạn có hiệu lực trên mọi worker.
+    Mỗi lần kiểm tra là 1 câu upsert có điều kiện (atomic); bucket đã hồi đầy được dọn định kỳ.
+    """
+
+    blocking = True
+
+    def __init__(self, engine, prune_every: int = 1000):
+        self.engine = engine
+        self.prune_every = prune_every
+        self._calls = 0
+        self._dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+
+    def hit(self, key: str, now: float, interval: float, tolerance: float) -> float:
+        table = RateLimitBucket.__table__
+        stmt = self._dialect.insert(table).values(key=key, tat=now + interval)
+        current = table.c.tat
+        # SQLite không có GREATEST; max() nhiều đối số tương đương
+        greatest = func.greatest if self._dialect is postgresql else func.max
+        next_tat = greatest(current, now) + interval
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={"tat": next_tat},
+            where=next_tat - now <= tolerance,
+        ).returning(table.c.tat)
+        with self.engine.begin() as conn:
+            if conn.execute(stmt).first() is not None:
+                wait = 0.0
+            else:
+                # Bị từ chối: bucket không đổi, tính thời gian chờ từ TAT hiện tại
+                tat = conn.execute(select(current).where(table.c.key == key)).scalar()
+                wait = max(tat or now, now) + interval - now - tolerance
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                conn.execute(delete(table).where(current < now))
+        return max(wait, 0.0)
+
+    def reset(self):
+        with self.engine.begin() as conn:
+            conn.execute(delete(RateLimitBucket.__table__))
+
+
+class RateLimiter:
+    """
+    Admission control cho endpoint tốn bcrypt: GCRA theo IP và theo username/user.
+    `limit` request mỗi `period` giây, cho phép burst tối đa `limit` (tương đương cửa sổ trượt).
+    Kiểm tra xảy ra trước mọi truy vấn user và mọi lần hash.
+    """
+
+    def __init__(self, backend, ip_limit: int, subject_limit: int, period: float = 60.0):
+        self.backend = backend
+        self.rules = {"ip": (ip_limit, period), "user": (subject_limit, period)}
+        self.rejected = 0
+
+    def _hit(self, scope: str, value: str) -> float:
+        limit, period = self.rules[scope]
+        if limit <= 0:
+            return 0.0
+        interval = period / limit
+        return self.backend.hit(f"{scope}:{value}", time.time(), interval, interval * limit)
+
+    def check(self, request, subject: str | None = None):
+        """Raise 429 (kèm Retry-After) nếu IP hoặc subject (username/user id) vượt giới hạn"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        client_ip = request.client.host if request.client else "-"
+        wait = self._hit("ip", client_ip)
+        if not wait and subject:
+            wait = self._hit("user", subject.strip().lower())
+        if wait:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please retry later",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+    async def check_async(self, request, subject: str | None = None):
+        if self.backend.blocking:
+            await run_in_threadpool(self.check, request, subject)
+        else:
+            self.check(request, subject)
+
+
+def _create_backend():
+    if settings.RATE_LIMIT_BACKEND == "database":
+        from database.database import engine
+        return DatabaseGCRABackend(engine)
+    return LocalGCRABackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+auth_rate_limiter = RateLimiter(
+    _create_backend(),
+    ip_limit=settings.RATE_LIMIT_AUTH_PER_IP,
+    subject_limit=settings.RATE_LIMIT_AUTH_PER_USER,
+    period=settings.RATE_LIMIT_PERIOD_SECONDS,
+)
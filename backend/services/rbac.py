@@ -1,15 +1,53 @@
+from typing import NamedTuple
+from sqlalchemy import select, exists, delete, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from database.models.auth_models import Role, Module, Permission, RolePermission, UserRole
+from database.models.auth_models import User, Role, Module, Permission, RolePermission, UserRole
+from services.permission_cache import permission_cache
+from services.rbac_registry import rbac_registry
+from services.invalidation import publish_invalidation
+from services.rbac_version import next_rbac_version
+
+# Thứ bậc role được lưu trong roles.rank; so sánh quyền quản lý là so sánh số nguyên
+ROOT_RANK = 100
+ADMIN_RANK = 50
+USER_RANK = 10
+
+ROLE_PERMISSION_KEY = ("role_id", "module_id", "permission_id")
+USER_ROLE_KEY = ("user_id", "role_id")
+# Cột id trong thao tác batch -> bảng mà khoá ngoại trỏ tới
+BATCH_REFERENCES = {"user_id": User, "role_id": Role, "module_id": Module, "permission_id": Permission}
+
+
+class UserAccess(NamedTuple):
+    """Entry trong permission_cache: quyền đã biên dịch {module: (action, ...)} + rank cao nhất"""
+    permissions: dict
+    rank: int
+
 
 class RBACService:
     def __init__(self, db: Session):
         self.db = db
 
+    def _insert_ignore(self, model, key_columns, rows):
+        """INSERT nhiều dòng ... ON CONFLICT (key) DO NOTHING RETURNING key; trả về set key đã chèn"""
+        if not rows:
+            return set()
+        dialect = postgresql if self.db.get_bind().dialect.name == "postgresql" else sqlite
+        columns = [getattr(model, c) for c in key_columns]
+        stmt = (
+            dialect.insert(model)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=list(key_columns))
+            .returning(*columns)
+        )
+        return {tuple(row) for row in self.db.execute(stmt)}
+
     def get_module_by_name(self, name: str):
-        return self.db.query(Module).filter_by(name=name).first()
+        return rbac_registry.get_module(self.db, name)
 
     def get_permission_by_name(self, name: str):
-        return self.db.query(Permission).filter_by(name=name).first()
+        return rbac_registry.get_permission(self.db, name)
 
     def delete_role(self, role_id: int):
         role = self.db.query(Role).filter_by(id=role_id).first()
@@ -19,40 +57,38 @@ class RBACService:
         self.db.query(RolePermission).filter_by(role_id=role_id).delete()
         self.db.query(UserRole).filter_by(role_id=role_id).delete()
         self.db.delete(role)
-        self.db.commit()
+        self._commit_rbac_change(True)
         return True
     
     def is_root(self, user):
         """Trả về True nếu user có role là root"""
-        user_roles = self.db.query(UserRole).filter_by(user_id=user.id).all()
-        role_ids = [ur.role_id for ur in user_roles]
-        if not role_ids:
-            return False
-        roles = self.db.query(Role).filter(Role.id.in_(role_ids)).all()
-        role_names = [r.name for r in roles]
-        return "root" in role_names
+        return self._get_access(user.id).rank >= ROOT_RANK
 
     def can_manage_user(self, current_user, target_user):
         """
         Chỉ root có thể thao tác với mọi user, admin chỉ thao tác với user thường, user không thao tác ai.
         """
-        # Lấy role của current_user và target_user
-        user_roles = self.db.query(UserRole).filter_by(user_id=current_user.id).all()
-        target_roles = self.db.query(UserRole).filter_by(user_id=target_user.id).all()
-        role_ids = [ur.role_id for ur in user_roles]
-        target_role_ids = [ur.role_id for ur in target_roles]
-        roles = self.db.query(Role).filter(Role.id.in_(role_ids)).all()
-        target_roles = self.db.query(Role).filter(Role.id.in_(target_role_ids)).all()
-        role_names = [r.name for r in roles]
-        target_role_names = [r.name for r in target_roles]
+        accesses = self._get_accesses([current_user.id, target_user.id])
+        return self._can_manage(accesses[current_user.id].rank, accesses[target_user.id].rank)
+
+    def get_manageable_user_ids(self, current_user, user_ids, accesses: dict | None = None) -> set:
+        """
+        Bulk cho màn hình danh sách: tập user_id mà current_user được thao tác.
+        accesses: {user_id: UserAccess} đã có sẵn (vd. từ access_from_roles) để khỏi load lại.
+        """
+        known = accesses or {}
+        accesses = {**self._get_accesses([user_id for user_id in [current_user.id, *user_ids] if user_id not in known]), **known}
+        current_rank = accesses[current_user.id].rank
+        return {user_id for user_id in user_ids if self._can_manage(current_rank, accesses[user_id].rank)}
+
+    @staticmethod
+    def _can_manage(current_rank: int, target_rank: int) -> bool:
         # Root quản lý tất cả
-        if "root" in role_names:
+        if current_rank >= ROOT_RANK:
             return True
         # Admin không được thao tác với root/admin
-        if "admin" in role_names:
-            if any(r in ["admin", "root"] for r in target_role_names):
-                return False
-            return True
+        if current_rank >= ADMIN_RANK:
+            return target_rank < ADMIN_RANK
         # User không thao tác ai
         return False
 
@@ -60,45 +96,144 @@ class RBACService:
         """
         Trả về dict dạng {module: [action, ...], ...} cho user
         """
-        permissions_dict = {}
-        # Lấy tất cả role của user
-        user_roles = self.db.query(UserRole).filter_by(user_id=user_id).all()
-        role_ids = [ur.role_id for ur in user_roles]
-        if not role_ids:
-            return permissions_dict
-        # Lấy tất cả RolePermission của các role này
-        role_perms = self.db.query(RolePermission).filter(RolePermission.role_id.in_(role_ids)).all()
-        # Lấy mapping module_id -> name, permission_id -> name
-        modules = {m.id: m.name for m in self.db.query(Module).all()}
-        perms = {p.id: p.name for p in self.db.query(Permission).all()}
-        for rp in role_perms:
-            module_name = modules.get(rp.module_id)
-            perm_name = perms.get(rp.permission_id)
-            if module_name is not None and perm_name is not None:
-                permissions_dict.setdefault(str(module_name), []).append(str(perm_name))
-        return permissions_dict
+        permissions = self._get_access(user_id).permissions
+        return {module: list(actions) for module, actions in permissions.items()}
+
+    def _get_access(self, user_id: int) -> UserAccess:
+        """Quyền đã biên dịch + rank của user, lấy từ cache, load DB khi miss"""
+        access = permission_cache.get(user_id)
+        if access is None:
+            access = self._load_accesses([user_id])[user_id]
+        return access
+
+    def _get_accesses(self, user_ids) -> dict:
+        """Bulk: {user_id: UserAccess}; user có trong cache không tốn query, phần còn lại load bằng 1 câu SQL"""
+        result = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            access = permission_cache.get(user_id)
+            if access is None:
+                missing.append(user_id)
+            else:
+                result[user_id] = access
+        if missing:
+            result.update(self._load_accesses(missing))
+        return result
+
+    def access_from_roles(self, roles, with_permissions: bool = True) -> UserAccess:
+        """
+        UserAccess từ các Role của 1 user đã load kèm `Role.permissions`
+        (vd. UserService.get_user_with_roles): không query thêm, tên lấy từ registry.
+        with_permissions=False: chỉ tính rank (roles chưa nạp permissions), permissions rỗng.
+        """
+        pairs = {}
+        if with_permissions:
+            pairs = dict.fromkeys((grant.module_id, grant.permission_id) for role in roles for grant in role.permissions)
+        permissions = rbac_registry.names_for_ids(self.db, pairs) if pairs else {}
+        return UserAccess(
+            permissions={module: tuple(actions) for module, actions in permissions.items()},
+            rank=max((role.rank for role in roles), default=0),
+        )
+
+    def get_permissions_for_users(self, user_ids) -> dict:
+        """
+        Bulk: {user_id: {module: [action, ...]}} cho cả trang user.
+        User có trong cache không tốn query, phần còn lại load bằng 1 câu SQL.
+        """
+        return {
+            user_id: {module: list(actions) for module, actions in access.permissions.items()}
+            for user_id, access in self._get_accesses(user_ids).items()
+        }
+
+    def get_role_names_for_users(self, user_ids) -> dict:
+        """Bulk: {user_id: [role_name, ...]} bằng 1 câu SQL user_roles ⋈ roles"""
+        user_ids = list(dict.fromkeys(user_ids))
+        result = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return result
+        stmt = (
+            select(UserRole.user_id, Role.name)
+            .join(Role, Role.id == UserRole.role_id)
+            .where(UserRole.user_id.in_(user_ids))
+            .order_by(UserRole.user_id, Role.id)
+        )
+        for user_id, role_name in self.db.execute(stmt):
+            if role_name not in result[user_id]:
+                result[user_id].append(role_name)
+        return result
+
+    def _load_accesses(self, user_ids) -> dict:
+        """
+        Load quyền + rank cao nhất cho nhiều user bằng 1 câu SQL
+        user_roles → roles / role_permissions, tên module/permission lấy từ registry; kết quả được cache.
+        """
+        # Lấy version trước khi query để không cache dữ liệu cũ nếu RBAC đổi giữa chừng
+        version = permission_cache.version
+        pairs = {user_id: [] for user_id in user_ids}
+        ranks = {user_id: 0 for user_id in user_ids}
+        stmt = (
+            select(UserRole.user_id, Role.rank, RolePermission.module_id, RolePermission.permission_id)
+            .select_from(UserRole)
+            .outerjoin(Role, Role.id == UserRole.role_id)
+            .outerjoin(RolePermission, RolePermission.role_id == UserRole.role_id)
+            .where(UserRole.user_id.in_(user_ids))
+            .distinct()
+        )
+        for user_id, rank, module_id, permission_id in self.db.execute(stmt):
+            if rank is not None and rank > ranks[user_id]:
+                ranks[user_id] = rank
+            if module_id is not None:
+                pairs[user_id].append((module_id, permission_id))
+        result = {}
+        for user_id in user_ids:
+            permissions = rbac_registry.names_for_ids(self.db, dict.fromkeys(pairs[user_id]))
+            access = UserAccess(
+                permissions={module: tuple(actions) for module, actions in permissions.items()},
+                rank=ranks[user_id],
+            )
+            permission_cache.set(user_id, access, version)
+            result[user_id] = access
+        return result
+
+    def _load_user_permission_ids(self, user_id: int) -> set:
+        """Tập (module_id, permission_id) mà user được cấp"""
+        stmt = (
+            select(RolePermission.module_id, RolePermission.permission_id)
+            .select_from(UserRole)
+            .join(RolePermission, RolePermission.role_id == UserRole.role_id)
+            .where(UserRole.user_id == user_id)
+            .distinct()
+        )
+        return {(module_id, permission_id) for module_id, permission_id in self.db.execute(stmt)}
+
+    def _has_permission(self, user_id: int, module_name: str, permission_name: str) -> bool:
+        """Kiểm tra 1 quyền bằng 1 câu SELECT EXISTS(...), tên module/permission resolve qua registry"""
+        module = rbac_registry.get_module(self.db, module_name)
+        permission = rbac_registry.get_permission(self.db, permission_name)
+        if module is None or permission is None:
+            return False
+        stmt = select(
+            exists().where(
+                UserRole.user_id == user_id,
+                RolePermission.role_id == UserRole.role_id,
+                RolePermission.module_id == module.id,
+                RolePermission.permission_id == permission.id,
+            )
+        )
+        return bool(self.db.execute(stmt).scalar())
     
     def remove_permission_from_role(self, role_id: int, module_id: int, permission_id: int):
-        rp = self.db.query(RolePermission).filter_by(role_id=role_id, module_id=module_id, permission_id=permission_id).first()
-        if rp:
-            self.db.delete(rp)
-            self.db.commit()
-            return True
-        return False
+        removed = self.remove_permissions_from_roles([(role_id, module_id, permission_id)])
+        return bool(removed)
 
     def is_admin_or_above(self, user):
-        user_roles = self.db.query(UserRole).filter_by(user_id=user.id).all()
-        if not user_roles:
-            return False
-        role_ids = [ur.role_id for ur in user_roles]
-        roles = self.db.query(Role).filter(Role.id.in_(role_ids)).all()
-        role_names = [r.name for r in roles]
-        return any(rn in ("admin", "root") for rn in role_names)
+        return self._get_access(user.id).rank >= ADMIN_RANK
 
-    def create_role(self, name: str, description: str = ""):
-        role = Role(name=name, description=description)
+    def create_role(self, name: str, description: str = "", rank: int = 0):
+        role = Role(name=name, description=description, rank=rank)
         self.db.add(role)
-        self.db.commit()
+        # Bump version RBAC để ETag của /rbac/roles đổi theo
+        self._commit_rbac_change(True)
         self.db.refresh(role)
         return role
     
@@ -121,6 +256,7 @@ class RBACService:
                 "id": role.id,
                 "name": role.name,
                 "description": role.description,
+                "rank": role.rank,
                 "permissions": role_perm_map.get(role.id, [])
             }
             result.append(role_dict)
@@ -129,8 +265,10 @@ class RBACService:
     def create_module(self, name: str, description: str = ""):
         module = Module(name=name, description=description)
         self.db.add(module)
-        self.db.commit()
+        publish_invalidation(self.db, "registry")
+        self._commit_rbac_change(True)
         self.db.refresh(module)
+        rbac_registry.add_module(module)
         return module
     
     def get_all_modules(self):
@@ -139,37 +277,159 @@ class RBACService:
     def create_permission(self, name: str, description: str = ""):
         permission = Permission(name=name, description=description)
         self.db.add(permission)
-        self.db.commit()
+        publish_invalidation(self.db, "registry")
+        self._commit_rbac_change(True)
         self.db.refresh(permission)
+        rbac_registry.add_permission(permission)
         return permission
     
     def get_all_permissions(self):
         return self.db.query(Permission).all()
 
     def assign_role_to_user(self, user_id: int, role_id: int):
-        user_role = UserRole(user_id=user_id, role_id=role_id)
-        self.db.add(user_role)
-        self.db.commit()
-        self.db.refresh(user_role)
-        return user_role
+        self.assign_roles_to_users([(user_id, role_id)])
+        return self.db.query(UserRole).filter_by(user_id=user_id, role_id=role_id).first()
 
     def assign_permission_to_role(self, role_id: int, module_id: int, permission_id: int):
-        rp = RolePermission(role_id=role_id, module_id=module_id, permission_id=permission_id)
-        self.db.add(rp)
+        self.assign_permissions_to_roles([(role_id, module_id, permission_id)])
+        return self.db.query(RolePermission).filter_by(role_id=role_id, module_id=module_id, permission_id=permission_id).first()
+
+    # --- Bulk: mỗi hàm là 1 câu SQL set-based; commit=False để gộp nhiều hàm vào 1 transaction ---
+    def assign_roles_to_users(self, pairs, commit: bool = True) -> set:
+        """Gán (user_id, role_id); trả về các cặp thực sự được thêm mới"""
+        rows = [dict(zip(USER_ROLE_KEY, pair)) for pair in dict.fromkeys(pairs)]
+        inserted = self._insert_ignore(UserRole, USER_ROLE_KEY, rows)
+        if commit:
+            self._commit_rbac_change(bool(inserted))
+        return inserted
+
+    def assign_permissions_to_roles(self, grants, commit: bool = True) -> set:
+        """Cấp (role_id, module_id, permission_id); trả về các bộ thực sự được thêm mới"""
+        rows = [dict(zip(ROLE_PERMISSION_KEY, grant)) for grant in dict.fromkeys(grants)]
+        inserted = self._insert_ignore(RolePermission, ROLE_PERMISSION_KEY, rows)
+        if commit:
+            self._commit_rbac_change(bool(inserted))
+        return inserted
+
+    def remove_permissions_from_roles(self, revokes, commit: bool = True) -> set:
+        """DELETE ... WHERE (role_id, module_id, permission_id) IN (...); trả về các bộ đã xoá"""
+        revokes = list(dict.fromkeys(revokes))
+        if not revokes:
+            return set()
+        key = tuple_(RolePermission.role_id, RolePermission.module_id, RolePermission.permission_id)
+        stmt = (
+            delete(RolePermission)
+            .where(key.in_(revokes))
+            .returning(RolePermission.role_id, RolePermission.module_id, RolePermission.permission_id)
+        )
+        removed = {tuple(row) for row in self.db.execute(stmt)}
+        if commit:
+            self._commit_rbac_change(bool(removed))
+        return removed
+
+    def _commit_rbac_change(self, changed: bool):
+        """
+        Commit thay đổi RBAC cùng version mới trong rbac_version; NOTIFY worker khác (phát khi commit)
+        rồi vô hiệu cache của process này
+        """
+        if changed:
+            version, changed_at = next_rbac_version(self.db)
+            publish_invalidation(self.db, "rbac", version=version, changed_at=changed_at.isoformat())
         self.db.commit()
-        self.db.refresh(rp)
-        return rp
-
-    def check_user_permission(self, user_id: int, module_name: str, permission_name: str) -> bool:
-        roles = self.db.query(UserRole).filter_by(user_id=user_id).all()
-        role_ids = [r.role_id for r in roles]
-        module = self.db.query(Module).filter_by(name=module_name).first()
-        permission = self.db.query(Permission).filter_by(name=permission_name).first()
-        if not module or not permission:
-            return False
-        count = self.db.query(RolePermission).filter(
-            RolePermission.role_id.in_(role_ids),
-            RolePermission.module_id == module.id,
-            RolePermission.permission_id == permission.id
-        ).count()
-        return count > 0
+        if changed:
+            permission_cache.set_version(version, changed_at)
+
+    def _unknown_ids(self, ids_by_field: dict) -> dict:
+        """{cột: set id} -> {cột: set id không có trong bảng tương ứng}; 1 câu IN cho mỗi cột"""
+        unknown = {}
+        for field, ids in ids_by_field.items():
+            model = BATCH_REFERENCES[field]
+            found = set(self.db.execute(select(model.id).where(model.id.in_(ids))).scalars())
+            unknown[field] = ids - found
+        return unknown
+
+    def apply_batch(self, operations) -> list:
+        """
+        Áp dụng list thao tác grant/revoke/assign_role trong 1 transaction.
+        Các thao tác liên tiếp cùng loại được gộp thành 1 câu SQL; thứ tự giữa các nhóm được giữ nguyên.
+        Trả về kết quả từng thao tác: applied | unchanged | invalid (thiếu trường hoặc id không tồn tại).
+        """
+        handlers = {
+            "grant": (self.assign_permissions_to_roles, ("role_id", "module_id", "permission_id")),
+            "revoke": (self.remove_permissions_from_roles, ("role_id", "module_id", "permission_id")),
+            "assign_role": (self.assign_roles_to_users, ("user_id", "role_id")),
+        }
+        results = [None] * len(operations)
+        group_op, group = None, []
+
+        def flush():
+            if not group:
+                return
+            handler, fields = handlers[group_op]
+            # id không tồn tại sẽ làm hỏng cả transaction (khoá ngoại) -> loại trước, báo invalid
+            unknown = self._unknown_ids({f: {key[i] for _, key in group} for i, f in enumerate(fields)})
+            valid = []
+            for index, key in group:
+                bad = [f"{f} {v}" for f, v in zip(fields, key) if v in unknown[f]]
+                if bad:
+                    results[index] = {"index": index, "op": group_op, "status": "invalid", "detail": f"Unknown {', '.join(bad)}"}
+                else:
+                    valid.append((index, key))
+            changed = handler([key for _, key in valid], commit=False) if valid else set()
+            for index, key in valid:
+                if key in changed:
+                    changed.discard(key)  # Trùng lặp trong cùng nhóm: lần đầu applied, các lần sau unchanged
+                    results[index] = {"index": index, "op": group_op, "status": "applied"}
+                else:
+                    results[index] = {"index": index, "op": group_op, "status": "unchanged"}
+            group.clear()
+
+        try:
+            for index, operation in enumerate(operations):
+                op = operation.get("op")
+                if op not in handlers:
+                    results[index] = {"index": index, "op": op, "status": "invalid", "detail": "Unknown operation"}
+                    continue
+                fields = handlers[op][1]
+                missing = [f for f in fields if operation.get(f) is None]
+                if missing:
+                    results[index] = {"index": index, "op": op, "status": "invalid", "detail": f"Missing {', '.join(missing)}"}
+                    continue
+                if op != group_op:
+                    flush()
+                    group_op = op
+                group.append((index, tuple(operation[f] for f in fields)))
+            flush()
+            self._commit_rbac_change(any(r["status"] == "applied" for r in results))
+        except Exception:
+            self.db.rollback()
+            raise
+        return results
+
+    def check_user_permission(self, user_id: int, module_name: str, permission_name: str, warm_cache: bool = False) -> bool:
+        """
+        Cache hit -> kiểm tra trong bộ nhớ. Cache miss -> 1 câu EXISTS,
+        hoặc load toàn bộ quyền vào cache nếu warm_cache (user sẽ còn được kiểm tra tiếp).
+        """
+        access = permission_cache.get(user_id)
+        if access is None:
+            if not warm_cache:
+                return self._has_permission(user_id, module_name, permission_name)
+            access = self._load_accesses([user_id])[user_id]
+        return permission_name in access.permissions.get(module_name, ())
+
+    def check_user_permissions(self, checks) -> dict:
+        """
+        Bulk: kiểm tra nhiều bộ (user_id, module, action) cùng lúc.
+        User chưa có trong cache được load bằng 1 câu SQL duy nhất.
+        Trả về {user_id: {module: {action: bool}}}
+        """
+        accesses = self._get_accesses([user_id for user_id, _, _ in checks])
+        result = {}
+        for user_id, module_name, permission_name in checks:
+            allowed = permission_name in accesses[user_id].permissions.get(module_name, ())
+            result.setdefault(user_id, {}).setdefault(module_name, {})[permission_name] = allowed
+        return result
+
+    def get_cache_stats(self) -> dict:
+        return permission_cache.stats()
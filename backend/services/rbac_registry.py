@@ -0,0 +1,114 @@
+import sys
+import threading
+from typing import NamedTuple, Optional
+from sqlalchemy.orm import Session
+from database.models.auth_models import Module, Permission
+
+
+class RegistryEntry(NamedTuple):
+    id: int
+    name: str
+    description: Optional[str] = None
+
+
+class _NameTable:
+    """Bảng name <-> id cho 1 loại (module hoặc permission); dict được thay nguyên khối khi load"""
+
+    def __init__(self, model):
+        self.model = model
+        self.by_name: dict = {}
+        self.by_id: dict = {}
+
+    def replace(self, rows):
+        by_name, by_id = {}, {}
+        for row in rows:
+            entry = RegistryEntry(row.id, sys.intern(row.name), row.description)
+            by_name[entry.name] = entry
+            by_id[entry.id] = entry
+        self.by_name, self.by_id = by_name, by_id
+
+    def add(self, row):
+        entry = RegistryEntry(row.id, sys.intern(row.name), row.description)
+        # Copy-on-write để reader không bao giờ thấy dict đang bị sửa
+        by_name = dict(self.by_name)
+        by_id = dict(self.by_id)
+        by_name[entry.name] = entry
+        by_id[entry.id] = entry
+        self.by_name, self.by_id = by_name, by_id
+        return entry
+
+
+class RBACRegistry:
+    """
+    Registry name <-> id của Module và Permission, load 1 lần trong lifespan.
+    Hai bảng này gần như tĩnh nên mọi lookup theo tên được resolve trong bộ nhớ;
+    chỉ hỏi DB khi gặp tên/id chưa biết (vd. worker khác vừa tạo).
+    """
+
+    def __init__(self):
+        self.modules = _NameTable(Module)
+        self.permissions = _NameTable(Permission)
+        self.loaded = False
+        # Các id mồ côi (role_permissions trỏ tới module/permission không tồn tại) đã từng gây reload
+        self._unknown_ids: set = set()
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        with self._lock:
+            self.modules.replace(db.query(Module).all())
+            self.permissions.replace(db.query(Permission).all())
+            self.loaded = True
+
+    def invalidate(self):
+        """Đánh dấu cần nạp lại ở lần lookup kế tiếp (vd. worker khác vừa tạo module/permission)"""
+        self.loaded = False
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            self.load(db)
+
+    def add_module(self, module: Module) -> RegistryEntry:
+        with self._lock:
+            return self.modules.add(module)
+
+    def add_permission(self, permission: Permission) -> RegistryEntry:
+        with self._lock:
+            return self.permissions.add(permission)
+
+    def _lookup_name(self, db: Session, table: _NameTable, name: str) -> Optional[RegistryEntry]:
+        self.ensure_loaded(db)
+        entry = table.by_name.get(name)
+        if entry is None:
+            row = db.query(table.model).filter_by(name=name).first()
+            if row is not None:
+                with self._lock:
+                    entry = table.add(row)
+        return entry
+
+    def get_module(self, db: Session, name: str) -> Optional[RegistryEntry]:
+        return self._lookup_name(db, self.modules, name)
+
+    def get_permission(self, db: Session, name: str) -> Optional[RegistryEntry]:
+        return self._lookup_name(db, self.permissions, name)
+
+    def names_for_ids(self, db: Session, pairs) -> dict:
+        """{module_name: [permission_name, ...]} từ các cặp (module_id, permission_id)"""
+        self.ensure_loaded(db)
+        pairs = list(pairs)
+        unknown = {("module", m) for m, _ in pairs if m not in self.modules.by_id}
+        unknown |= {("permission", p) for _, p in pairs if p not in self.permissions.by_id}
+        if unknown - self._unknown_ids:
+            # Có id chưa biết -> worker khác vừa tạo module/permission, nạp lại 1 lần
+            self.load(db)
+            self._unknown_ids |= unknown
+        modules, permissions = self.modules.by_id, self.permissions.by_id
+        result = {}
+        for module_id, permission_id in pairs:
+            module = modules.get(module_id)
+            permission = permissions.get(permission_id)
+            if module is not None and permission is not None:
+                result.setdefault(module.name, []).append(permission.name)
+        return result
+
+
+rbac_registry = RBACRegistry()
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from database.models.rbac_version import RBACVersion, RBAC_VERSION_ROW_ID
+from services.permission_cache import permission_cache
+
+
+def next_rbac_version(db: Session) -> tuple:
+    """
+    Tăng version RBAC dùng chung trong transaction hiện tại, trả về (version, changed_at).
+    Dòng bị khoá tới khi commit nên các thay đổi RBAC đồng thời nhận version liên tiếp, không trùng.
+    """
+    changed_at = datetime.now(timezone.utc)
+    version = db.execute(
+        update(RBACVersion)
+        .where(RBACVersion.id == RBAC_VERSION_ROW_ID)
+        .values(version=RBACVersion.version + 1, changed_at=changed_at)
+        .returning(RBACVersion.version)
+    ).scalar()
+    if version is None:
+        raise RuntimeError("rbac_version row is missing: run migrations or ensure_rbac_version_row() at startup")
+    return version, changed_at
+
+
+def ensure_rbac_version_row(db: Session):
+    """Tạo dòng version (DB dựng bằng create_all); INSERT ... ON CONFLICT DO NOTHING nên chạy song song vẫn an toàn"""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    db.execute(
+        dialect.insert(RBACVersion)
+        .values(id=RBAC_VERSION_ROW_ID, version=0, changed_at=datetime.now(timezone.utc))
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+    db.commit()
+
+
+def load_rbac_version(db: Session | None = None):
+    """Đọc version RBAC từ DB vào permission_cache (khởi động, hoặc khi có thể đã lỡ NOTIFY)"""
+    if db is None:
+        # Import muộn: import services.rbac (benchmark, script) không đòi DATABASE_URL
+        from database.database import SessionLocal
+    session = db or SessionLocal()
+    try:
+        row = session.execute(
+            select(RBACVersion.version, RBACVersion.changed_at).where(RBACVersion.id == RBAC_VERSION_ROW_ID)
+        ).first()
+    finally:
+        if db is None:
+            session.close()
+    if row is not None:
+        permission_cache.set_version(row.version, row.changed_at)
+
+
+def apply_rbac_message(message: dict):
+    """Handler NOTIFY "rbac": message mang version mới; không có thì đọc lại từ DB"""
+    if message.get("version") is None:
+        load_rbac_version()
+        return
+    permission_cache.set_version(message["version"], datetime.fromisoformat(message["changed_at"]))
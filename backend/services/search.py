@@ -0,0 +1,20 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+
+def escape_like(term: str) -> str:
+    """Escape ký tự đại diện của LIKE để từ khoá được so khớp nguyên văn"""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def contains_any(db: Session, columns, term: str):
+    """
+    Điều kiện "term xuất hiện trong ít nhất 1 cột" (không phân biệt hoa thường).
+    Postgres: ILIKE trực tiếp trên từng cột (không bọc lower()) để planner dùng được
+    index GIN gin_trgm_ops của cột đó và gộp các nhánh OR bằng BitmapOr.
+    SQLite (test): LIKE vốn không phân biệt hoa thường với ASCII, không có index trigram.
+    """
+    pattern = f"%{escape_like(term)}%"
+    if db.get_bind().dialect.name == "postgresql":
+        return or_(*(column.ilike(pattern, escape="\\") for column in columns))
+    return or_(*(column.like(pattern, escape="\\") for column in columns))
@@ -0,0 +1,93 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from calendar import timegm
+from datetime import datetime
+from config.settings import settings
+
+_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+_TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class TokenError(Exception):
+    """Token sai định dạng, sai chữ ký hoặc đã hết hạn"""
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _json_segment(value: dict) -> bytes:
+    return _b64encode(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+class TokenCodec:
+    """
+    Encode/decode JWT HMAC (HS256/384/512), tương thích token do python-jose phát hành.
+    Key HMAC được tính sẵn 1 lần (chỉ copy trạng thái khi ký) và header segment được encode sẵn.
+    """
+
+    def __init__(self, secret: str, algorithm: str = "HS256"):
+        if algorithm not in _DIGESTS:
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self._mac = hmac.new(secret.encode("utf-8"), digestmod=_DIGESTS[algorithm])
+        # Cùng thứ tự key với jose (sort_keys) để token giữ nguyên từng byte
+        self._header = _json_segment({"alg": algorithm, "typ": "JWT"})
+
+    def _signature(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: dict) -> str:
+        payload = dict(claims)
+        for name in _TIME_CLAIMS:
+            value = payload.get(name)
+            if isinstance(value, datetime):
+                payload[name] = timegm(value.utctimetuple())
+        signing_input = self._header + b"." + _json_segment(payload)
+        return (signing_input + b"." + _b64encode(self._signature(signing_input))).decode("ascii")
+
+    def decode(self, token: str) -> dict:
+        try:
+            signing_input, _, signature = token.encode("ascii").rpartition(b".")
+            header, _, payload = signing_input.partition(b".")
+            # Đúng 3 segment header.payload.signature
+            if not header or not payload or b"." in payload:
+                raise TokenError("Malformed token")
+            if header != self._header:
+                # Header khác bản encode sẵn (vd. thứ tự key khác) -> kiểm tra alg thật sự
+                if json.loads(_b64decode(header)).get("alg") != self.algorithm:
+                    raise TokenError("Unexpected token algorithm")
+            if not hmac.compare_digest(_b64decode(signature), self._signature(signing_input)):
+                raise TokenError("Signature verification failed")
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, UnicodeError, AttributeError) as e:
+            raise TokenError("Malformed token") from e
+        if not isinstance(claims, dict):
+            raise TokenError("Malformed token")
+        now = time.time()
+        exp = claims.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise TokenError("Expiration Time claim (exp) must be an integer")
+            if exp < now:
+                raise TokenError("Signature has expired")
+        nbf = claims.get("nbf")
+        if nbf is not None:
+            if not isinstance(nbf, (int, float)):
+                raise TokenError("Not Before claim (nbf) must be an integer")
+            if nbf > now:
+                raise TokenError("The token is not yet valid (nbf)")
+        return claims
+
+
+access_token_codec = TokenCodec(settings.JWT_SECRET_KEY, settings.JWT_ALGORITHM)
+refresh_token_codec = TokenCodec(settings.JWT_REFRESH_SECRET_KEY, settings.JWT_ALGORITHM)
@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from config.settings import settings
+from database.database import SessionLocal
+from database.models.refresh_family import RefreshFamily
+from database.models.revoked_token import RevokedToken
+from services.invalidation import publish_invalidation, register_handler
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch(value: datetime) -> float:
+    # SQLite trả về datetime naive (đã lưu UTC)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _merge_cutoff(cutoffs: dict, user_id: int, revoked_at: float, expires_at: float):
+    # Chỉ giữ mốc thu hồi mới nhất của user
+    current = cutoffs.get(user_id)
+    if current is None or revoked_at > current[0]:
+        cutoffs[user_id] = (revoked_at, expires_at)
+
+
+# Chỉ đọc cột cần cho chỉ mục, không dựng ORM object cho từng dòng
+REVOCATION_COLUMNS = (
+    RevokedToken.id, RevokedToken.kind, RevokedToken.value, RevokedToken.user_id,
+    RevokedToken.revoked_at, RevokedToken.expires_at,
+)
+
+
+class BloomFilter:
+    """Bloom filter cố định kích thước; k vị trí bit lấy từ 1 digest blake2b (double hashing)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationIndex:
+    """
+    Chỉ mục thu hồi trong process, kiểm tra khi refresh mà không hỏi DB.
+    Chỉ chứa thu hồi thật (logout theo family, mốc thu hồi theo user); jti đã dùng khi xoay vòng
+    được theo dõi bằng refresh_families nên kích thước không tăng theo lưu lượng refresh.
+    Bloom filter đứng trước tập chính xác: token chưa bị thu hồi (đa số) bị loại ngay ở Bloom.
+    Đồng bộ tăng dần từ bảng revoked_tokens theo id (kèm NOTIFY trên Postgres);
+    Bloom được dựng lại khi dọn entry hết hạn hoặc khi vượt sức chứa.
+    """
+
+    def __init__(self, capacity: int = 100000):
+        self.capacity = capacity
+        self._bloom = BloomFilter(capacity)
+        self._exact: dict = {}  # "<kind>:<value>" -> expires_at (epoch)
+        self._user_cutoffs: dict = {}  # user_id -> (revoked_at, expires_at) mới nhất
+        self.last_id = 0
+        self.bloom_rejects = 0
+        self.exact_checks = 0
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, value: str, expires_at: float, user_id: int | None = None, revoked_at: float | None = None):
+        with self._lock:
+            if kind == "user":
+                _merge_cutoff(self._user_cutoffs, user_id, revoked_at, expires_at)
+                return
+            key = f"{kind}:{value}"
+            self._exact[key] = expires_at
+            self._bloom.add(key)
+            if len(self._exact) > self._bloom.capacity:
+                self._rebuild_bloom(len(self._exact) * 2)
+
+    def _add_row(self, row):
+        self.add(row.kind, row.value, _epoch(row.expires_at), row.user_id, _epoch(row.revoked_at))
+
+    def _rebuild_bloom(self, capacity: int):
+        bloom = BloomFilter(max(capacity, self.capacity))
+        for key in self._exact:
+            bloom.add(key)
+        self._bloom = bloom
+
+    def contains(self, kind: str, value: str) -> bool:
+        key = f"{kind}:{value}"
+        if key not in self._bloom:
+            self.bloom_rejects += 1
+            return False
+        self.exact_checks += 1
+        return key in self._exact
+
+    def is_family_revoked(self, claims: dict) -> bool:
+        """Family của token bị thu hồi (logout) hoặc token phát hành trước mốc thu hồi của user"""
+        if self.contains("family", claims.get("fam")):
+            return True
+        cutoff = self._user_cutoffs.get(int(claims["sub"]))
+        return cutoff is not None and claims.get("iat", 0) < cutoff[0]
+
+    def sync(self, db: Session) -> int:
+        """Nạp các dòng mới (id > last_id) từ bảng revoked_tokens"""
+        rows = db.execute(select(*REVOCATION_COLUMNS).where(RevokedToken.id > self.last_id).order_by(RevokedToken.id)).all()
+        for row in rows:
+            self._add_row(row)
+        if rows:
+            self.last_id = max(self.last_id, rows[-1].id)
+        return len(rows)
+
+    def rebuild(self, db: Session):
+        """
+        Dựng lại toàn bộ từ các dòng còn hiệu lực; bỏ entry đã hết hạn khỏi bộ nhớ.
+        Bloom/tập chính xác/mốc user mới được dựng ngoài lock rồi thay cả 3 cùng lúc:
+        contains()/is_family_revoked() không lấy lock nên không được thấy chỉ mục rỗng giữa chừng.
+        """
+        now = datetime.now(timezone.utc)
+        rows = db.execute(select(*REVOCATION_COLUMNS).where(RevokedToken.expires_at > now).order_by(RevokedToken.id)).all()
+        exact, cutoffs = {}, {}
+        for row in rows:
+            if row.kind == "user":
+                _merge_cutoff(cutoffs, row.user_id, _epoch(row.revoked_at), _epoch(row.expires_at))
+            else:
+                exact[f"{row.kind}:{row.value}"] = _epoch(row.expires_at)
+        bloom = BloomFilter(max(self.capacity, len(exact) * 2))
+        for key in exact:
+            bloom.add(key)
+        with self._lock:
+            self._bloom, self._exact, self._user_cutoffs = bloom, exact, cutoffs
+            if rows:
+                self.last_id = max(self.last_id, rows[-1].id)
+        # Bắt các dòng được ghi trong lúc đang dựng lại (kể cả dòng nhận qua NOTIFY vào chỉ mục cũ)
+        self.sync(db)
+
+    def _maintain(self, rebuild: bool):
+        db = SessionLocal()
+        try:
+            if rebuild:
+                # Dọn dòng hết hạn trong DB rồi dựng lại chỉ mục
+                now = datetime.now(timezone.utc)
+                db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+                db.execute(delete(RefreshFamily).where(RefreshFamily.expires_at < now))
+                db.commit()
+                self.rebuild(db)
+            else:
+                self.sync(db)
+        finally:
+            db.close()
+
+    async def run(self, interval: float, rebuild_every: int = 720):
+        """Task nền: đồng bộ tăng dần mỗi `interval` giây, dọn và dựng lại sau mỗi `rebuild_every` lần"""
+        cycles = 0
+        while True:
+            await asyncio.sleep(interval)
+            cycles += 1
+            try:
+                await asyncio.to_thread(self._maintain, cycles % rebuild_every == 0)
+            except Exception:
+                logger.exception("Failed to sync token revocations")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "revoked": len(self._exact),
+                "user_cutoffs": len(self._user_cutoffs),
+                "bloom_bits": self._bloom.size,
+                "bloom_hashes": self._bloom.hashes,
+                "last_id": self.last_id,
+                "bloom_rejects": self.bloom_rejects,
+                "exact_checks": self.exact_checks,
+            }
+
+
+revocation_index = RevocationIndex(capacity=settings.REVOCATION_INDEX_CAPACITY)
+
+
+def _apply_revocation_message(message: dict):
+    if message.get("value") is None:
+        return
+    revocation_index.add(
+        message["token_kind"], message["value"], message["expires_at"],
+        user_id=message.get("user_id"), revoked_at=message.get("revoked_at"),
+    )
+
+
+register_handler("revocation", _apply_revocation_message)
+
+
+class TokenRevocationService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _revoke(self, kind: str, value: str, user_id: int | None, expires_at: datetime) -> bool:
+        """Ghi 1 dòng thu hồi; trả về False nếu (kind, value) đã bị thu hồi trước đó"""
+        revoked_at = datetime.now(timezone.utc)
+        dialect = postgresql if self.db.get_bind().dialect.name == "postgresql" else sqlite
+        stmt = (
+            dialect.insert(RevokedToken)
+            .values(kind=kind, value=value, user_id=user_id, revoked_at=revoked_at, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=["kind", "value"])
+            .returning(RevokedToken.id)
+        )
+        inserted = self.db.execute(stmt).first() is not None
+        if inserted:
+            publish_invalidation(
+                self.db, "revocation", token_kind=kind, value=value, user_id=user_id,
+                revoked_at=revoked_at.timestamp(), expires_at=expires_at.timestamp(),
+            )
+        self.db.commit()
+        if inserted:
+            revocation_index.add(kind, value, expires_at.timestamp(), user_id, revoked_at.timestamp())
+        return inserted
+
+    def _family_expiry(self) -> datetime:
+        # Token mới nhất của family có thể vừa được phát hành -> giữ đủ 1 vòng đời refresh token
+        return datetime.now(timezone.utc) + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+
+    def revoke_family(self, family: str, user_id: int) -> bool:
+        return self._revoke("family", family, user_id, self._family_expiry())
+
+    def revoke_user_tokens(self, user_id: int) -> bool:
+        """Thu hồi mọi refresh token của user phát hành trước thời điểm này (vd. khi đổi mật khẩu)"""
+        return self._revoke("user", f"{user_id}:{time.time_ns()}", user_id, self._family_expiry())
+
+
+class RefreshFamilyService:
+    """jti hiện tại của từng family refresh token; mỗi lần xoay vòng là 1 câu UPDATE compare-and-set"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def start(self, family: str, jti: str, user_id: int, expires_at: datetime):
+        """Family mới khi đăng nhập"""
+        self.db.add(RefreshFamily(family=family, current_jti=jti, user_id=user_id, expires_at=expires_at))
+        self.db.commit()
+
+    def rotate(self, family: str, jti: str, new_jti: str, expires_at: datetime) -> bool:
+        """
+        Thay jti hiện tại bằng new_jti nếu jti được trình ra đúng là jti hiện tại.
+        False: jti cũ (token đã dùng bị dùng lại) hoặc family không tồn tại/đã hết hạn.
+        """
+        result = self.db.execute(
+            update(RefreshFamily)
+            .where(RefreshFamily.family == family, RefreshFamily.current_jti == jti)
+            .values(current_jti=new_jti, expires_at=expires_at)
+        )
+        self.db.commit()
+        return result.rowcount == 1
@@ -1,23 +1,57 @@
-from sqlalchemy.orm import Session
-from database.models.auth_models import User
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from database.models.auth_models import User, Role
 from schemas.users import UserCreate, UserUpdate
+from services.permission_cache import permission_cache
+from services.principal_cache import principal_cache
+from services.invalidation import publish_invalidation
+from services.rbac_version import next_rbac_version
+from services.pagination import apply_keyset, parse_sort
+from services.search import contains_any
+from services.list_totals import fetch_page_and_total, list_total_cache
+
+# Các cột được phép sắp xếp (mỗi cột có index tổng hợp (cột, id))
+USER_SORT_COLUMNS = {"id": User.id, "created_at": User.created_at}
+
+
+def user_load_options(fields: set | None = None, extra_columns=(), single: bool = False) -> list:
+    """
+    Loader options theo sparse fieldset: chỉ SELECT các cột được yêu cầu (cộng extra_columns,
+    vd. cột sắp xếp cho cursor) và chỉ nạp roles / quyền của role khi field tương ứng được yêu cầu.
+    fields=None: toàn bộ cột + roles + quyền. single: joinedload roles (1 user) thay vì selectinload (cả trang).
+    """
+    load_roles = joinedload(User.roles) if single else selectinload(User.roles)
+    if fields is None:
+        return [load_roles.selectinload(Role.permissions)]
+    columns = {name for name in (*fields, *extra_columns) if name in User.__table__.columns}
+    if "status" in fields:
+        columns.add("is_active")
+    options = [load_only(*(getattr(User, name) for name in columns))]
+    if "permissions" in fields:
+        options.append(load_roles.selectinload(Role.permissions))
+    elif "roles" in fields or "can_manage" in fields:
+        options.append(load_roles)
+    return options
 
 class UserService:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_user(self, user_data: UserCreate) -> User:
-        # Check if username already exists
-        existing_username = self.db.query(User).filter_by(username=user_data.username).first()
-        if existing_username:
+    def ensure_username_available(self, username: str):
+        """HTTPException 409 nếu username đã tồn tại; gọi trước khi hash mật khẩu để request trùng không tốn bcrypt"""
+        if self.db.query(User.id).filter_by(username=username).first() is not None:
             from fastapi import HTTPException, status
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail=f"User with username '{user_data.username}' already exists."
+                detail=f"User with username '{username}' already exists."
             )
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        hashed_password = pwd_context.hash(user_data.password)
+
+    def create_user(self, user_data: UserCreate, hashed_password: str | None = None) -> User:
+        """hashed_password: hash đã tính sẵn (vd. trong process pool); None thì hash tại chỗ"""
+        # Kiểm tra lại dù caller đã gọi ensure_username_available (có thể bị tạo trùng giữa chừng)
+        self.ensure_username_available(user_data.username)
+        if hashed_password is None:
+            from security import hash_password
+            hashed_password = hash_password(user_data.password)
         new_user = User(
             username=user_data.username,
             email=user_data.email,
@@ -28,7 +62,9 @@ class UserService:
             role=user_data.role
         )
         self.db.add(new_user)
+        publish_invalidation(self.db, "list_totals", table="users")
         self.db.commit()
+        list_total_cache.invalidate("users")
         self.db.refresh(new_user)
         return new_user
 
@@ -36,9 +72,25 @@ class UserService:
     def get_user(self, user_id: int) -> User | None:
         return self.db.query(User).filter(User.id == user_id).first()
 
+    def get_cache_version(self, user_id: int):
+        """Chỉ đọc (version, updated_at) của user cho ETag / Last-Modified, không load cả user; None nếu không có"""
+        return self.db.query(User.version, User.updated_at).filter(User.id == user_id).first()
+
+    def get_user_with_roles(self, user_id: int, fields: set | None = None) -> User | None:
+        """
+        User kèm roles và quyền của từng role: 1 query users ⋈ roles + 1 query role_permissions.
+        fields: sparse fieldset (xem user_load_options), bỏ các phần không được yêu cầu.
+        """
+        return (
+            self.db.query(User)
+            .options(*user_load_options(fields, single=True))
+            .filter(User.id == user_id)
+            .first()
+        )
+
 
     def update_user(self, user_id: int, update_data: UserUpdate) -> User | None:
-        from database.models.auth_models import UserRole, Role
+        from database.models.auth_models import UserRole
         user = self.get_user(user_id)
         if not user:
             return None
@@ -63,8 +115,21 @@ class UserService:
                 new_user_role = UserRole(user_id=user_id, role_id=role_obj.id)
                 self.db.add(new_user_role)
         if update_dict:
+            update_dict["version"] = User.version + 1
             self.db.query(User).filter(User.id == user_id).update(update_dict)
+        publish_invalidation(self.db, "user", user_id=user_id)
+        if update_data.username is not None or update_data.email is not None:
+            # Đổi username/email làm thay đổi kết quả tìm kiếm
+            publish_invalidation(self.db, "list_totals", table="users")
+        if update_data.role is not None:
+            rbac_version, rbac_changed_at = next_rbac_version(self.db)
+            publish_invalidation(self.db, "rbac", version=rbac_version, changed_at=rbac_changed_at.isoformat())
         self.db.commit()
+        principal_cache.invalidate(user_id)
+        if update_data.username is not None or update_data.email is not None:
+            list_total_cache.invalidate("users")
+        if update_data.role is not None:
+            permission_cache.set_version(rbac_version, rbac_changed_at)
         self.db.refresh(user)
         return user
 
@@ -74,26 +139,45 @@ class UserService:
         if not user:
             return False
         self.db.delete(user)
+        publish_invalidation(self.db, "user", user_id=user_id)
+        publish_invalidation(self.db, "list_totals", table="users")
         self.db.commit()
+        principal_cache.invalidate(user_id)
+        list_total_cache.invalidate("users")
         return True
 
 
-    def list_users(self, skip: int = 0, limit: int = 10, search: str = "") -> list[User]:
+    def _search_query(self, search: str = ""):
         query = self.db.query(User)
         if search:
-            search_lower = f"%{search.lower()}%"
-            query = query.filter(
-                (User.username.ilike(search_lower)) |
-                (User.email.ilike(search_lower))
-            )
-        return query.order_by(User.id.asc()).offset(skip).limit(limit).all()
+            query = query.filter(contains_any(self.db, (User.username, User.email), search))
+        return query
+
+    def list_users(self, skip: int = 0, limit: int = 10, search: str = "", sort: str = "id", after: dict | None = None) -> list[User]:
+        """after: cursor đã giải mã (keyset, bỏ qua skip); sort: 'id', 'created_at', tiền tố '-' để giảm dần"""
+        column, descending = parse_sort(sort, USER_SORT_COLUMNS)
+        query = apply_keyset(self._search_query(search), column, User.id, descending, after)
+        if after is None:
+            query = query.offset(skip)
+        return query.limit(limit).all()
+
+    def list_users_with_total(
+        self, skip: int = 0, limit: int = 10, search: str = "", sort: str = "id",
+        after: dict | None = None, count: str = "exact", options: list | None = None,
+    ) -> tuple[list[User], int | None]:
+        """
+        Như list_users, kèm tổng số user khớp tìm kiếm (xem fetch_page_and_total cho các chế độ count).
+        options: loader options (vd. user_load_options) để nạp sẵn roles + quyền cho cả trang bằng selectin (không N+1).
+        """
+        column, descending = parse_sort(sort, USER_SORT_COLUMNS)
+        base_query = self._search_query(search)
+        page_query = apply_keyset(base_query, column, User.id, descending, after)
+        if options:
+            page_query = page_query.options(*options)
+        return fetch_page_and_total(
+            self.db, User, base_query, page_query,
+            search=search, offset=None if after else skip, limit=limit, count=count,
+        )
 
     def count_users(self, search: str = "") -> int:
-        query = self.db.query(User)
-        if search:
-            search_lower = f"%{search.lower()}%"
-            query = query.filter(
-                (User.username.ilike(search_lower)) |
-                (User.email.ilike(search_lower))
-            )
-        return query.count()
\ No newline at end of file
+        return self._search_query(search).count()
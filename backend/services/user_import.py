@@ -0,0 +1,188 @@
+import csv
+import json
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from config.settings import settings
+from database.models.auth_models import User, Role
+from schemas.users import UserCreate
+from services.invalidation import publish_invalidation
+from services.list_totals import list_total_cache
+from services.password_hashing import password_hasher
+from services.rbac import RBACService
+
+
+class UndecodableLineError(ValueError):
+    """Dòng trong body không phải UTF-8 hợp lệ; line là số dòng vật lý (từ 1)"""
+
+    def __init__(self, line: int):
+        super().__init__(f"Line {line} is not valid UTF-8")
+        self.line = line
+
+
+def decode_lines(lines):
+    """Dòng bytes (body request, file mở dạng nhị phân) -> str UTF-8; dòng lỗi -> UndecodableLineError kèm số dòng"""
+    for line_num, line in enumerate(lines, start=1):
+        try:
+            yield line.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise UndecodableLineError(line_num)
+
+
+def parse_csv(lines):
+    """(số dòng, dict | lỗi) cho từng dòng dữ liệu CSV; dòng đầu là header"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        if None in row:
+            yield reader.line_num, "Too many columns"
+            continue
+        # Ô trống -> None để dùng giá trị mặc định của UserCreate
+        yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}
+
+
+def parse_ndjson(lines):
+    """(số dòng, dict | lỗi) cho từng dòng JSON; bỏ qua dòng trống"""
+    for line_num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield line_num, "Invalid JSON"
+            continue
+        yield line_num, data if isinstance(data, dict) else "Expected a JSON object"
+
+
+PARSERS = {"csv": parse_csv, "ndjson": parse_ndjson}
+
+
+def _validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first["loc"])
+    return f"{field}: {first['msg']}" if field else first["msg"]
+
+
+class UserImportService:
+    """
+    Import user hàng loạt theo lô: kiểm tra trùng bằng 1 query/lô, hash song song trên process pool,
+    INSERT nhiều dòng cho users và user_roles, commit 1 lần/lô. Dòng lỗi được ghi vào báo cáo,
+    không làm hỏng cả lô.
+    """
+
+    def __init__(self, db: Session, batch_size: int = settings.USER_IMPORT_BATCH_SIZE, allow_root: bool = False):
+        self.db = db
+        self.batch_size = batch_size
+        self.allow_root = allow_root
+        self._seen_usernames: set = set()
+        self._seen_emails: set = set()
+        self.report = {"total": 0, "created": 0, "failed": 0, "errors": []}
+
+    def _fail(self, line: int, username, error: str):
+        self.report["failed"] += 1
+        self.report["errors"].append({"line": line, "username": username, "error": error})
+
+    def import_rows(self, rows) -> dict:
+        """
+        rows: iterable (số dòng, dict | chuỗi lỗi) từ parse_csv/parse_ndjson.
+        Nguồn dòng ném UndecodableLineError -> dừng import, dòng đó được ghi vào báo cáo.
+        """
+        batch = []
+        try:
+            for line, data in rows:
+                self.report["total"] += 1
+                batch.append((line, data))
+                if len(batch) >= self.batch_size:
+                    self._import_batch(batch)
+                    batch = []
+        except UndecodableLineError as e:
+            # Không đọc tiếp được phần sau của body: dừng tại dòng lỗi, giữ các lô đã commit
+            self.report["total"] += 1
+            self._fail(e.line, None, "Line is not valid UTF-8, import stopped")
+        if batch:
+            self._import_batch(batch)
+        self.report["errors"].sort(key=lambda error: error["line"])
+        return self.report
+
+    def _validate(self, batch) -> list:
+        valid = []
+        for line, data in batch:
+            if isinstance(data, str):
+                self._fail(line, None, data)
+                continue
+            try:
+                user = UserCreate(**data)
+            except ValidationError as e:
+                self._fail(line, data.get("username"), _validation_message(e))
+                continue
+            if user.role == "root" and not self.allow_root:
+                self._fail(line, user.username, "Not allowed to assign role root")
+            elif user.username in self._seen_usernames:
+                self._fail(line, user.username, "Duplicate username in import")
+            elif user.email in self._seen_emails:
+                self._fail(line, user.username, "Duplicate email in import")
+            else:
+                self._seen_usernames.add(user.username)
+                self._seen_emails.add(user.email)
+                valid.append((line, user))
+        return valid
+
+    def _import_batch(self, batch):
+        valid = self._validate(batch)
+        if not valid:
+            return
+        usernames = [user.username for _, user in valid]
+        emails = [user.email for _, user in valid]
+        existing = self.db.execute(
+            select(User.username, User.email).where(or_(User.username.in_(usernames), User.email.in_(emails)))
+        ).all()
+        taken_usernames = {row.username for row in existing}
+        taken_emails = {row.email for row in existing}
+        role_ids = dict(self.db.execute(
+            select(Role.name, Role.id).where(Role.name.in_({user.role for _, user in valid}))
+        ).all())
+
+        pending = []
+        for line, user in valid:
+            if user.username in taken_usernames:
+                self._fail(line, user.username, "Username already exists")
+            elif user.email in taken_emails:
+                self._fail(line, user.username, "Email already exists")
+            elif user.role not in role_ids:
+                self._fail(line, user.username, f"Unknown role '{user.role}'")
+            else:
+                pending.append((line, user))
+        if not pending:
+            return
+
+        hashes = password_hasher.hash_many([user.password for _, user in pending])
+        rows = [
+            {
+                "username": user.username,
+                "email": user.email,
+                "hashed_password": hashed_password,
+                "full_name": user.full_name,
+                "phone": user.phone,
+                "is_active": user.is_active,
+                "role": user.role,
+            }
+            for (_, user), hashed_password in zip(pending, hashes)
+        ]
+        dialect = postgresql if self.db.get_bind().dialect.name == "postgresql" else sqlite
+        # Có thể bị request khác tạo trùng sau bước kiểm tra: dòng đó không được trả về
+        stmt = dialect.insert(User).values(rows).on_conflict_do_nothing().returning(User.id, User.username)
+        created = dict((row.username, row.id) for row in self.db.execute(stmt))
+        RBACService(self.db).assign_roles_to_users(
+            [(created[user.username], role_ids[user.role]) for _, user in pending if user.username in created],
+            commit=False,
+        )
+        if created:
+            publish_invalidation(self.db, "list_totals", table="users")
+        self.db.commit()
+        if created:
+            list_total_cache.invalidate("users")
+        for line, user in pending:
+            if user.username in created:
+                self.report["created"] += 1
+            else:
+                self._fail(line, user.username, "Username or email already exists")
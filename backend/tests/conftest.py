@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# DB SQLite tạm cho cả phiên test; phải đặt trước khi import config.settings.
+# Chạy trong thư mục tạm để app không ghi logs/ hay đọc .env của thư mục backend.
+_work_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.chdir(_work_dir)
+os.environ["DATABASE_URL"] = f"sqlite:///{_work_dir}/test.db"
+os.environ.setdefault("JWT_SECRET_KEY", "test-access-secret")
+os.environ.setdefault("JWT_REFRESH_SECRET_KEY", "test-refresh-secret")
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    # Lifespan tạo bảng và seed role/module/permission + tài khoản mặc định
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def root_headers(client):
+    response = client.post("/auth/login", json={"username": "root", "password": "root123456"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def db_session(client):
+    from database.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def count_queries():
+    """Đếm số câu SQL gửi tới DB trong khối with: `with count_queries() as queries: ...; queries.count`"""
+    from sqlalchemy import event
+    from database.database import engine
+
+    @contextmanager
+    def counter():
+        class Queries:
+            count = 0
+
+        def before_cursor_execute(*args):
+            Queries.count += 1
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield Queries
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return counter
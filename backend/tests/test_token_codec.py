@@ -0,0 +1,109 @@
+"""
+TokenCodec phải giữ nguyên hành vi của python-jose (HS256) trước khi bỏ jose khỏi requirements.
+"""
+import base64
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.token_codec import TokenCodec, TokenError
+
+SECRET = "codec-test-secret"
+CLAIMS = {"sub": "42", "role": "admin", "jti": "abc", "exp": 4102444800}
+# jose.jwt.encode(CLAIMS, SECRET, algorithm="HS256") với python-jose 3.3.0
+JOSE_TOKEN = (
+    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9"
+    ".eyJzdWIiOiI0MiIsInJvbGUiOiJhZG1pbiIsImp0aSI6ImFiYyIsImV4cCI6NDEwMjQ0NDgwMH0"
+    ".s-ffqahKseBsLcDkcbSqEOBYNU5qGVXypy6ws5LPTcc"
+)
+
+
+def _segment(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+
+
+@pytest.fixture
+def codec():
+    return TokenCodec(SECRET)
+
+
+def test_round_trip(codec):
+    expires = datetime.now(timezone.utc) + timedelta(minutes=5)
+    claims = codec.decode(codec.encode({"sub": "7", "type": "access", "exp": expires}))
+    assert claims == {"sub": "7", "type": "access", "exp": int(expires.timestamp())}
+
+
+def test_matches_jose_token(codec):
+    assert codec.decode(JOSE_TOKEN) == CLAIMS
+    assert codec.encode(CLAIMS) == JOSE_TOKEN
+
+
+def test_decodes_token_from_installed_jose(codec):
+    jwt = pytest.importorskip("jose.jwt")
+    claims = {"sub": "9", "exp": int(time.time()) + 60}
+    assert codec.decode(jwt.encode(claims, SECRET, algorithm="HS256")) == claims
+
+
+def test_rejects_other_secret():
+    with pytest.raises(TokenError):
+        TokenCodec("another-secret").decode(JOSE_TOKEN)
+
+
+def test_rejects_tampered_signature(codec):
+    header, payload, signature = JOSE_TOKEN.split(".")
+    tampered = signature[:-2] + ("AA" if signature[-2:] != "AA" else "BB")
+    with pytest.raises(TokenError):
+        codec.decode(".".join((header, payload, tampered)))
+
+
+def test_rejects_tampered_payload(codec):
+    header, _, signature = JOSE_TOKEN.split(".")
+    payload = _segment(dict(CLAIMS, role="root"))
+    with pytest.raises(TokenError, match="Signature verification failed"):
+        codec.decode(".".join((header, payload, signature)))
+
+
+@pytest.mark.parametrize("alg", ["HS512", "none", "RS256"])
+def test_rejects_unexpected_algorithm(codec, alg):
+    _, payload, signature = JOSE_TOKEN.split(".")
+    header = _segment({"alg": alg, "typ": "JWT"})
+    with pytest.raises(TokenError, match="Unexpected token algorithm"):
+        codec.decode(".".join((header, payload, signature)))
+    # alg none: chữ ký rỗng
+    with pytest.raises(TokenError):
+        codec.decode(".".join((header, payload, "")))
+
+
+def test_rejects_expired_token(codec):
+    token = codec.encode({"sub": "7", "exp": int(time.time()) - 10})
+    with pytest.raises(TokenError, match="expired"):
+        codec.decode(token)
+
+
+def test_rejects_non_numeric_exp(codec):
+    with pytest.raises(TokenError):
+        codec.decode(codec.encode({"sub": "7", "exp": "never"}))
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "abc",
+    JOSE_TOKEN.rsplit(".", 1)[0],
+    JOSE_TOKEN + ".extra",
+    "..",
+    "a.b.c.d",
+])
+def test_rejects_malformed_segments(codec, token):
+    with pytest.raises(TokenError, match="Malformed token"):
+        codec.decode(token)
+
+
+def test_rejects_extra_segment_with_valid_signature(codec):
+    # Ký đúng trên "header.payload.extra" nhưng vẫn không phải JWT 3 segment
+    header, payload, _ = JOSE_TOKEN.split(".")
+    signing_input = f"{header}.{payload}.e30".encode()
+    signature = base64.urlsafe_b64encode(codec._signature(signing_input)).rstrip(b"=").decode()
+    with pytest.raises(TokenError, match="Malformed token"):
+        codec.decode(f"{header}.{payload}.e30.{signature}")
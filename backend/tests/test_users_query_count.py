@@ -0,0 +1,40 @@
+from sqlalchemy import insert, select
+
+from database.models.auth_models import Role, User
+from services.rbac import RBACService
+
+PAGE_ROWS = 100
+
+
+def _seed_users(db, count: int):
+    """count user (mỗi user 1 role) ghi thẳng vào DB, không qua hash mật khẩu"""
+    role_id = db.execute(select(Role.id).where(Role.name == "user")).scalar_one()
+    rows = [
+        {"username": f"qc{i}", "email": f"qc{i}@example.com", "hashed_password": "x", "role": "user"}
+        for i in range(count)
+    ]
+    user_ids = db.execute(insert(User).returning(User.id), rows).scalars().all()
+    RBACService(db).assign_roles_to_users([(user_id, role_id) for user_id in user_ids])
+
+
+def test_list_users_query_count_does_not_grow_with_page_size(client, root_headers, db_session, count_queries):
+    _seed_users(db_session, PAGE_ROWS)
+    # Làm nóng cache (principal, quyền của người gọi, tổng số dòng) để chỉ đo phần phụ thuộc vào trang
+    assert client.get("/users/?page_size=10", headers=root_headers).status_code == 200
+    assert client.get(f"/users/?page_size={PAGE_ROWS}", headers=root_headers).status_code == 200
+
+    with count_queries() as small:
+        response = client.get("/users/?page_size=10", headers=root_headers)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 10
+
+    with count_queries() as large:
+        response = client.get(f"/users/?page_size={PAGE_ROWS}", headers=root_headers)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert len(data) == PAGE_ROWS
+    assert all(user["roles"] for user in data)
+
+    # Trang users (kèm tổng) + roles của cả trang + quyền của các role: không có query theo từng user
+    assert large.count == small.count
+    assert large.count <= 3